@@ -1,5 +1,6 @@
+from .pack import pack
 from .test import test
 from .train import train
 from .viz import viz
 
-__all__ = ("test", "train", "viz")
+__all__ = ("pack", "test", "train", "viz")
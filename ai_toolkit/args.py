@@ -5,7 +5,7 @@ import json
 import random
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Mapping
 
 import numpy as np
 import torch
@@ -21,26 +21,42 @@ class Arguments:
 
     batch_dim: int
     batch_size: int
+    bucket: bool
     checkpoint: Path
+    checkpoint_every_steps: int
     config: str
     dataset: str
     epochs: int
     gamma: float
+    image_budget: int
     img_dim: int
+    in_memory: bool
+    lazy_shuffle: bool
     log_interval: int
     loss: str
     lr: float
+    max_tokens: int | None
     metrics: str
     model: str
     no_save: bool
     no_verify: bool
     no_visualize: bool
+    nproc: int
     num_examples: int
     num_workers: int
     plot: bool
+    precision: str
+    prefetch: int
+    profile: bool
     save_dir: Path
+    save_predictions: bool
+    scalar_logs: list[str]
     scheduler: bool
+    shard_dir: Path
+    shuffle_buffer: int
+    stream: bool
     test_batch_size: int
+    timing: bool
     use_best: bool
 
     def update(self, args_json: dict[str, Any]) -> None:
@@ -71,9 +87,15 @@ def get_parsed_arguments(arg_list: tuple[str, ...]) -> Arguments:
     parser.add_argument("--batch-size", type=int, default=128, metavar="B",
                         help="input batch size for training (default: 128)")
 
+    parser.add_argument("--bucket", action="store_true",
+                        help="batch sequences of similar length together")
+
     parser.add_argument("--checkpoint", type=Path, default=None, metavar="CKPT",
                         help="for loading a checkpoint model")
 
+    parser.add_argument("--checkpoint-every-steps", type=int, default=0, metavar="N",
+                        help="also checkpoint every N training batches (default: 0)")
+
     parser.add_argument("--config", type=str, default="",
                         help="config file as args: <checkpoints, configs>/<name>.json")
 
@@ -86,9 +108,18 @@ def get_parsed_arguments(arg_list: tuple[str, ...]) -> Arguments:
     parser.add_argument("--gamma", type=float, default=0.7, metavar="G",
                         help="Learning rate step gamma (default: 0.7)")
 
+    parser.add_argument("--image-budget", type=int, default=64, metavar="N",
+                        help="validation images to log per epoch (default: 64)")
+
     parser.add_argument("--img-dim", type=int, default=256, metavar="N",
                         help="set image size")
 
+    parser.add_argument("--in-memory", action="store_true",
+                        help="serve batches from in-memory tensors, not a DataLoader")
+
+    parser.add_argument("--lazy-shuffle", action="store_true",
+                        help="split and shuffle with O(1)-memory keyed permutations")
+
     parser.add_argument("--log-interval", type=int, default=10, metavar="NB",
                         help="how many batches to wait before logging training status")
 
@@ -98,6 +129,9 @@ def get_parsed_arguments(arg_list: tuple[str, ...]) -> Arguments:
     parser.add_argument("--lr", type=float, default=3e-3, metavar="LR",
                         help="learning rate (default: 3e-3)")
 
+    parser.add_argument("--max-tokens", type=int, default=None, metavar="T",
+                        help="bucket batches by padded token budget, not batch size")
+
     parser.add_argument("--metrics", nargs="+", type=str, default=["Loss", "Accuracy"],
                         help="metrics to use during training (space-separated)")
 
@@ -113,6 +147,9 @@ def get_parsed_arguments(arg_list: tuple[str, ...]) -> Arguments:
     parser.add_argument("--no-visualize", action="store_true",
                         help="do not save visualization files")
 
+    parser.add_argument("--nproc", type=int, default=1, metavar="N",
+                        help="number of data-parallel training processes (default: 1)")
+
     parser.add_argument("--num-examples", type=int, default=None, metavar="N",
                         help="number of training examples")
 
@@ -122,15 +159,46 @@ def get_parsed_arguments(arg_list: tuple[str, ...]) -> Arguments:
     parser.add_argument("--plot", action="store_true",
                         help="plot training examples")
 
+    parser.add_argument("--precision", type=str, default="fp32",
+                        choices=tuple(util.PRECISION_DTYPES),
+                        help="autocast precision; fp16 needs CUDA (default: fp32)")
+
+    parser.add_argument("--prefetch", type=int, default=0, metavar="K",
+                        help="number of batches to load in the background; random "
+                             "augmentation is then nondeterministic unless "
+                             "--num-workers > 0 (default: 0)")
+
+    parser.add_argument("--profile", action="store_true",
+                        help="capture a torch.profiler trace of early training steps")
+
     parser.add_argument("--save-dir", type=Path, default=Path("checkpoints"),
                         help="checkpoint directory to use")
 
+    parser.add_argument("--save-predictions", action="store_true",
+                        help="write test set outputs to the checkpoint's directory")
+
+    parser.add_argument("--scalar-logs", nargs="+", type=str, default=["tensorboard"],
+                        choices=("tensorboard", "columnar"),
+                        help="where to log scalars: tensorboard and/or columnar")
+
     parser.add_argument("--scheduler", action="store_true",
                         help="use learning rate scheduler")
 
+    parser.add_argument("--shard-dir", type=Path, default=None, metavar="DIR",
+                        help="directory of samples packed by pack.py to read/write")
+
+    parser.add_argument("--shuffle-buffer", type=int, default=10000, metavar="N",
+                        help="shuffle buffer size for --stream (default: 10000)")
+
+    parser.add_argument("--stream", action="store_true",
+                        help="stream examples from the source files, not from memory")
+
     parser.add_argument("--test-batch-size", type=int, default=1000, metavar="N",
                         help="input batch size for testing (default: 1000)")
 
+    parser.add_argument("--timing", action="store_true",
+                        help="time each phase of every step and report throughput")
+
     parser.add_argument("--use-best", action="store_true",
                         help="use best val metric checkpoint (default: most recent)")
     # fmt: on
@@ -146,12 +214,12 @@ def load_args_from_json(args: Arguments, found_json: Path) -> None:
             args.update(json.load(f))
 
 
-def init_pipeline(*arg_list: str) -> tuple[Arguments, torch.device, dict[str, Any]]:
+def init_pipeline(*arg_list: str) -> tuple[Arguments, torch.device, Mapping[str, Any]]:
     """Pass in the empty list to skip argument parsing."""
     set_random_seeds()
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     args = get_parsed_arguments(arg_list)
-    checkpoint: dict[str, Any] = {}
+    checkpoint: Mapping[str, Any] = {}
     if args.config:
         load_args_from_json(args, Path(f"configs/{args.config}.json"))
     elif args.checkpoint is not None:
@@ -159,6 +227,9 @@ def init_pipeline(*arg_list: str) -> tuple[Arguments, torch.device, dict[str, An
         load_args_from_json(args, checkpoint_path / "args.json")
         if checkpoint_path.is_dir():
             checkpoint = util.load_checkpoint(checkpoint_path, args.use_best)
+    if args.precision == "fp16" and device.type != "cuda":
+        # CPU autocast does not support fp16, and GradScaler is CUDA-only.
+        raise RuntimeError("--precision fp16 requires CUDA; use bf16 on CPU.")
     return args, device, checkpoint
 
 
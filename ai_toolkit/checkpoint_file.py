@@ -0,0 +1,146 @@
+"""
+Sectioned checkpoint format. Every top-level key of a checkpoint dict is stored as
+its own section: a pickle of the non-tensor structure plus raw tensor bytes. A JSON
+header indexes all sections, and loading memory-maps the file, so only the sections
+that are read get decoded and only the tensor pages that are touched get paged in.
+
+Layout: MAGIC | header length (uint64 LE) | JSON header | padding | data
+"""
+from __future__ import annotations
+
+import io
+import json
+import mmap
+import pickle
+import struct
+from pathlib import Path
+from typing import Any, Iterator, Mapping
+
+import torch
+
+MAGIC = b"AITKCKPT"
+ALIGNMENT = 64
+# Tensors are written through an integer view, which also covers dtypes that numpy
+# does not support, such as bfloat16. complex128 is written as pairs of int64.
+INT_VIEWS = {
+    1: torch.uint8,
+    2: torch.int16,
+    4: torch.int32,
+    8: torch.int64,
+    16: torch.int64,
+}
+
+
+class TensorPickler(pickle.Pickler):
+    def __init__(self, file: io.BytesIO, tensors: list[torch.Tensor]) -> None:
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.tensors = tensors
+
+    def persistent_id(self, obj: Any) -> int | None:
+        if isinstance(obj, torch.Tensor):
+            if obj.element_size() not in INT_VIEWS:
+                raise RuntimeError(f"Cannot save tensors of dtype {obj.dtype}.")
+            self.tensors.append(obj.detach().cpu().contiguous())
+            return len(self.tensors) - 1
+        return None
+
+
+class TensorUnpickler(pickle.Unpickler):
+    def __init__(self, file: io.BytesIO, tensors: list[torch.Tensor]) -> None:
+        super().__init__(file)
+        self.tensors = tensors
+
+    def persistent_load(self, pid: Any) -> torch.Tensor:
+        return self.tensors[int(pid)]
+
+
+def align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save(state: dict[str, Any], path: Path) -> None:
+    sections: dict[str, Any] = {}
+    blobs: list[tuple[int, bytes | torch.Tensor]] = []
+    offset = 0
+    for name, obj in state.items():
+        tensors: list[torch.Tensor] = []
+        buffer = io.BytesIO()
+        TensorPickler(buffer, tensors).dump(obj)
+        pickled = buffer.getvalue()
+        sections[name] = {"pickle": [offset, len(pickled)], "tensors": []}
+        blobs.append((offset, pickled))
+        offset = align(offset + len(pickled))
+        for tensor in tensors:
+            nbytes = tensor.numel() * tensor.element_size()
+            sections[name]["tensors"].append(
+                {
+                    "dtype": str(tensor.dtype).replace("torch.", ""),
+                    "shape": list(tensor.shape),
+                    "offset": offset,
+                    "nbytes": nbytes,
+                }
+            )
+            blobs.append((offset, tensor))
+            offset = align(offset + nbytes)
+
+    header = json.dumps({"sections": sections}).encode()
+    data_start = align(len(MAGIC) + 8 + len(header))
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for blob_offset, blob in blobs:
+            f.seek(data_start + blob_offset)
+            if isinstance(blob, torch.Tensor):
+                if blob.numel() > 0:
+                    int_view = blob.reshape(-1).view(INT_VIEWS[blob.element_size()])
+                    f.write(int_view.numpy().data)
+            else:
+                f.write(blob)
+        f.truncate(data_start + offset)
+
+
+class LazyCheckpoint(Mapping[str, Any]):
+    """
+    Read-only checkpoint dict backed by a memory-mapped file. Sections are decoded
+    on first access; tensors are zero-copy views of the (copy-on-write) mapping.
+    """
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        (header_len,) = struct.unpack_from("<Q", self.buffer, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self.buffer[header_start : header_start + header_len])
+        self.sections: dict[str, Any] = header["sections"]
+        self.data_start = align(header_start + header_len)
+        self.cache: dict[str, Any] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.cache:
+            section = self.sections[name]
+            tensors = [self.load_tensor(info) for info in section["tensors"]]
+            offset, nbytes = section["pickle"]
+            start = self.data_start + offset
+            pickled = io.BytesIO(self.buffer[start : start + nbytes])
+            self.cache[name] = TensorUnpickler(pickled, tensors).load()
+        return self.cache[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.sections)
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def load_tensor(self, info: dict[str, Any]) -> torch.Tensor:
+        dtype = getattr(torch, info["dtype"])
+        if info["nbytes"] == 0:
+            return torch.empty(info["shape"], dtype=dtype)
+        return torch.frombuffer(
+            self.buffer,
+            dtype=dtype,
+            count=info["nbytes"] // torch.empty((), dtype=dtype).element_size(),
+            offset=self.data_start + info["offset"],
+        ).reshape(info["shape"])
+
+
+def load(path: Path) -> LazyCheckpoint:
+    return LazyCheckpoint(path)
@@ -1,18 +1,41 @@
-import sys
-from typing import cast
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, cast
+
+from ai_toolkit.registry import Registry
 
 from .dataset import DatasetLoader, TensorDataLoader
-from .dataset_cnn import DatasetCNN
-from .dataset_lstm import DatasetLSTM
-from .dataset_penn import DatasetPenn
-from .dataset_rnn import DatasetRNN
+from .prefetch_loader import PrefetchLoader
+from .tensor_loader import TensorBatchLoader
+
+if TYPE_CHECKING:
+    from .dataset_cnn import DatasetCNN
+    from .dataset_lstm import DatasetLSTM
+    from .dataset_penn import DatasetPenn
+    from .dataset_rnn import DatasetRNN
+
+# Datasets import torchvision, PIL and wget, so they are only imported when used.
+DATASETS = Registry(
+    __name__,
+    "ai_toolkit.datasets",
+    {
+        "DatasetCNN": ".dataset_cnn:DatasetCNN",
+        "DatasetLSTM": ".dataset_lstm:DatasetLSTM",
+        "DatasetPenn": ".dataset_penn:DatasetPenn",
+        "DatasetRNN": ".dataset_rnn:DatasetRNN",
+    },
+)
 
 
 def get_dataset_initializer(dataset_name: str) -> DatasetLoader:
     """Retrieves class initializer from its string name."""
-    if not hasattr(sys.modules[__name__], dataset_name):
+    if dataset_name not in DATASETS:
         raise RuntimeError(f"Dataset class {dataset_name} not found in datasets/")
-    return cast(DatasetLoader, getattr(sys.modules[__name__], dataset_name)())
+    return cast(DatasetLoader, DATASETS.get(dataset_name)())
+
+
+def __getattr__(name: str) -> Any:
+    return DATASETS.module_getattr(__name__, name)
 
 
 __all__ = (
@@ -20,6 +43,8 @@ __all__ = (
     "DatasetLSTM",
     "DatasetPenn",
     "DatasetRNN",
+    "PrefetchLoader",
+    "TensorBatchLoader",
     "TensorDataLoader",
     "get_dataset_initializer",
 )
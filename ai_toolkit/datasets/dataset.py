@@ -2,28 +2,139 @@ from __future__ import annotations
 
 import sys
 from pathlib import Path
-from typing import Any, Callable, Tuple
+from typing import Any, Callable, Iterator, List, Sized, Tuple, cast
 
 import torch
-from torch.utils.data import DataLoader, TensorDataset, random_split
+from torch.utils.data import (
+    DataLoader,
+    DistributedSampler,
+    IterableDataset,
+    Sampler,
+    TensorDataset,
+    random_split,
+)
 from torch.utils.data.dataloader import default_collate
 
+from ai_toolkit import distributed
 from ai_toolkit.args import Arguments
+from ai_toolkit.datasets.permutation import (
+    FeistelPermutation,
+    PermutationSampler,
+    PermutationSubset,
+)
+from ai_toolkit.datasets.prefetch_loader import prefetch
+from ai_toolkit.datasets.sharded_dataset import ShardedDataset
+from ai_toolkit.datasets.streaming import StreamingTextDataset
+from ai_toolkit.datasets.tensor_loader import TensorBatchLoader, materialize
 
 TensorDataLoader = DataLoader[Tuple[torch.Tensor, ...]]
 
 
+class ShardSampler(Sampler[int]):
+    """
+    Evaluation counterpart of DistributedSampler. Each rank gets every
+    world_size-th index without padding, so summed metrics cover each example once.
+    """
+
+    def __init__(self, data_source: Sized) -> None:
+        self.indices = range(
+            distributed.get_rank(), len(data_source), distributed.get_world_size()
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.indices)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+
+class BucketBatchSampler(Sampler[List[int]]):
+    """
+    Groups sequences of similar length to minimize padding. Each epoch, examples
+    are shuffled with a generator seeded from (seed, epoch), cut into pools of
+    pool_factor * batch_size examples, and sorted by length within each pool.
+    Batches hold batch_size examples, or, if max_tokens is set, as many examples
+    as fit in max_tokens padded tokens. The order of the batches is shuffled too.
+    The batches of the current epoch are cached, since len() needs them as well.
+    """
+
+    def __init__(
+        self,
+        lengths: torch.Tensor,
+        batch_size: int,
+        max_tokens: int | None = None,
+        shuffle: bool = True,
+        seed: int = 0,
+        pool_factor: int = 100,
+    ) -> None:
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.shuffle = shuffle
+        self.seed = seed
+        self.pool_size = pool_factor * batch_size
+        self.epoch = 0
+        self.cache: tuple[tuple[int, int, int], list[list[int]]] | None = None
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def get_batches(self) -> list[list[int]]:
+        key = (self.epoch, distributed.get_rank(), distributed.get_world_size())
+        if self.cache is None or self.cache[0] != key:
+            self.cache = (key, self.build_batches())
+        return self.cache[1]
+
+    def build_batches(self) -> list[list[int]]:
+        generator = torch.Generator().manual_seed(self.seed + self.epoch)
+        num_examples = len(self.lengths)
+        order = (
+            torch.randperm(num_examples, generator=generator)
+            if self.shuffle
+            else torch.arange(num_examples)
+        )
+        batches: list[list[int]] = []
+        for pool in order.split(self.pool_size):
+            pool_lengths, perm = self.lengths[pool].sort(stable=True)
+            if self.max_tokens is None:
+                batches += [b.tolist() for b in pool[perm].split(self.batch_size)]
+                continue
+            batch: list[int] = []
+            for index, length in zip(pool[perm].tolist(), pool_lengths.tolist()):
+                # Lengths are ascending, so the new example sets the padded length.
+                if batch and (len(batch) + 1) * length > self.max_tokens:
+                    batches.append(batch)
+                    batch = []
+                batch.append(index)
+            if batch:
+                batches.append(batch)
+
+        if self.shuffle:
+            batch_order = torch.randperm(len(batches), generator=generator).tolist()
+            batches = [batches[i] for i in batch_order]
+        world_size = distributed.get_world_size()
+        if world_size > 1:
+            # Every rank must run the same number of training steps.
+            if self.shuffle:
+                batches = batches[: len(batches) // world_size * world_size]
+            batches = batches[distributed.get_rank() :: world_size]
+        return batches
+
+    def __iter__(self) -> Iterator[list[int]]:
+        return iter(self.get_batches())
+
+    def __len__(self) -> int:
+        return len(self.get_batches())
+
+
 class DatasetLoader:
     def __init__(self) -> None:
         self.CLASS_LABELS: list[str] = []
         self.DATA_PATH = Path("/content/" if "google.colab" in sys.modules else "data/")
 
     @staticmethod
-    def get_collate_fn(device: torch.device) -> Callable[[list[Any]], Any]:
-        """
-        for indices in batch_sampler:
-            yield collate_fn([dataset[i] for i in indices])
-        """
+    def get_batch_fn(device: torch.device) -> Callable[[Any], Any]:
+        """Transforms an already-collated batch, e.g. moving it to the device."""
 
         def to_device(b: torch.Tensor) -> Any:
             return (
@@ -32,7 +143,70 @@ class DatasetLoader:
                 else b.to(device)
             )
 
-        return lambda x: map(to_device, default_collate(x))
+        return lambda x: map(to_device, x)
+
+    @classmethod
+    def get_collate_fn(cls, device: torch.device) -> Callable[[list[Any]], Any]:
+        """
+        for indices in batch_sampler:
+            yield collate_fn([dataset[i] for i in indices])
+        """
+        batch_fn = cls.get_batch_fn(device)
+        return lambda x: batch_fn(default_collate(x))
+
+    @staticmethod
+    def get_batch_tensors(orig_dataset: TensorDataset) -> Any:
+        """
+        Returns the whole dataset collated into tensors for TensorBatchLoader.
+        Override this when the tensors can be built without calling __getitem__.
+        """
+        return materialize(orig_dataset)
+
+    @staticmethod
+    def get_lengths(orig_dataset: TensorDataset) -> torch.Tensor | None:
+        """Sequence length of every example, for datasets that support bucketing."""
+        del orig_dataset
+        return None
+
+    def load_dataset(self, train: bool = True) -> Any:
+        """Builds the dataset that load_train_data or load_test_data splits."""
+        raise NotImplementedError
+
+    def load_stream(self) -> StreamingTextDataset:
+        """Builds a streaming version of the dataset, for --stream."""
+        raise RuntimeError(f"{type(self).__name__} does not support streaming.")
+
+    def get_dataset(self, args: Arguments, train: bool = True) -> Any:
+        """
+        Reads samples from the shards written by pack.py if --shard-dir is set,
+        or streams them from the source files if --stream is set.
+        """
+        if args.stream:
+            if args.shard_dir:
+                raise RuntimeError("--stream and --shard-dir cannot be combined.")
+            return self.load_stream()
+        if args.shard_dir:
+            return ShardedDataset(args.shard_dir / ("train" if train else "test"))
+        return self.load_dataset(train)
+
+    @staticmethod
+    def get_test_sampler(test_set: Any) -> Sampler[int] | None:
+        """Splits the test set between processes when test.py runs with --nproc."""
+        if distributed.is_initialized() and not isinstance(test_set, IterableDataset):
+            return ShardSampler(test_set)
+        return None
+
+    @staticmethod
+    def get_collate_device(args: Arguments, device: torch.device) -> torch.device:
+        """With --prefetch, batches are collated on CPU for PrefetchLoader to move."""
+        return torch.device("cpu") if args.prefetch else device
+
+    @staticmethod
+    def prefetch(
+        loader: TensorDataLoader, args: Arguments, device: torch.device
+    ) -> TensorDataLoader:
+        # PrefetchLoader implements the TensorDataLoader interface.
+        return cast(TensorDataLoader, prefetch(loader, args.prefetch, device))
 
     def split_data(
         self,
@@ -40,11 +214,39 @@ class DatasetLoader:
         args: Arguments,
         device: torch.device,
         val_split: float,
+    ) -> tuple[TensorDataLoader, TensorDataLoader]:
+        train_loader, val_loader = self.get_split_loaders(
+            orig_dataset, args, self.get_collate_device(args, device), val_split
+        )
+        return (
+            self.prefetch(train_loader, args, device),
+            self.prefetch(val_loader, args, device),
+        )
+
+    def get_split_loaders(
+        self,
+        orig_dataset: TensorDataset,
+        args: Arguments,
+        device: torch.device,
+        val_split: float,
     ) -> tuple[TensorDataLoader, TensorDataLoader]:
         collate_fn = self.get_collate_fn(device)
-        generator_seed = torch.Generator().manual_seed(0)
+        if isinstance(orig_dataset, StreamingTextDataset):
+            return self.split_stream(orig_dataset, args, collate_fn, val_split)
+
+        seed = 0
+        generator_seed = torch.Generator().manual_seed(seed)
         orig_len = len(orig_dataset)
-        if args.num_examples:
+        train_set: Any
+        val_set: Any
+        if args.lazy_shuffle:
+            # Same sizes as below, without materializing a permutation.
+            train_size = args.num_examples or int((1 - val_split) * orig_len)
+            val_size = args.num_examples or orig_len - train_size
+            permutation = FeistelPermutation(orig_len, seed)
+            train_set = PermutationSubset(orig_dataset, permutation, 0, train_size)
+            val_set = PermutationSubset(orig_dataset, permutation, train_size, val_size)
+        elif args.num_examples:
             n = args.num_examples
             data_split = [n, n, orig_len - 2 * n]
             train_set, val_set = random_split(orig_dataset, data_split, generator_seed)[
@@ -55,10 +257,86 @@ class DatasetLoader:
             data_split = [train_size, orig_len - train_size]
             train_set, val_set = random_split(orig_dataset, data_split, generator_seed)
 
+        if args.bucket or args.max_tokens:
+            lengths = (
+                orig_dataset.lengths
+                if isinstance(orig_dataset, ShardedDataset)
+                else self.get_lengths(orig_dataset)
+            )
+            if lengths is None or args.in_memory:
+                raise RuntimeError(
+                    f"{type(self).__name__} does not support length bucketing."
+                )
+            train_batch_sampler = BucketBatchSampler(
+                lengths[train_set.indices], args.batch_size, args.max_tokens, True, seed
+            )
+            val_batch_sampler = BucketBatchSampler(
+                lengths[val_set.indices], args.batch_size, args.max_tokens, False, seed
+            )
+            return (
+                DataLoader(
+                    train_set,
+                    batch_sampler=train_batch_sampler,
+                    collate_fn=collate_fn,
+                    pin_memory=torch.cuda.is_available(),
+                    num_workers=args.num_workers,
+                ),
+                DataLoader(
+                    val_set,
+                    batch_sampler=val_batch_sampler,
+                    collate_fn=collate_fn,
+                    pin_memory=torch.cuda.is_available(),
+                    num_workers=args.num_workers,
+                ),
+            )
+
+        if args.in_memory:
+            tensors = (
+                orig_dataset.get_tensors()
+                if isinstance(orig_dataset, ShardedDataset)
+                else self.get_batch_tensors(orig_dataset)
+            )
+            batch_fn = self.get_batch_fn(device)
+            # TensorBatchLoader implements the TensorDataLoader interface.
+            return (
+                cast(
+                    TensorDataLoader,
+                    TensorBatchLoader(
+                        tensors,
+                        train_set.indices,
+                        args.batch_size,
+                        batch_fn,
+                        shuffle=True,
+                        seed=seed,
+                    ),
+                ),
+                cast(
+                    TensorDataLoader,
+                    TensorBatchLoader(
+                        tensors, val_set.indices, args.batch_size, batch_fn
+                    ),
+                ),
+            )
+
+        train_sampler: Sampler[int] | None = None
+        val_sampler: Sampler[int] | None = None
+        if args.lazy_shuffle:
+            train_sampler = PermutationSampler(train_set, seed)
+            if distributed.is_initialized():
+                val_sampler = ShardSampler(val_set)
+        elif distributed.is_initialized():
+            # drop_last instead of padding, so that no example is counted twice in
+            # the epoch metrics, and every rank still runs the same number of steps.
+            train_sampler = DistributedSampler(
+                train_set, shuffle=True, seed=0, drop_last=True
+            )
+            val_sampler = ShardSampler(val_set)
+
         train_loader = DataLoader(
             train_set,
             batch_size=args.batch_size,
-            shuffle=True,
+            shuffle=train_sampler is None,
+            sampler=train_sampler,
             collate_fn=collate_fn,
             pin_memory=torch.cuda.is_available(),
             num_workers=args.num_workers,
@@ -66,12 +344,45 @@ class DatasetLoader:
         val_loader = DataLoader(
             val_set,
             batch_size=args.batch_size,
+            sampler=val_sampler,
             collate_fn=collate_fn,
             pin_memory=torch.cuda.is_available(),
             num_workers=args.num_workers,
         )
         return train_loader, val_loader
 
+    @staticmethod
+    def split_stream(
+        orig_dataset: StreamingTextDataset,
+        args: Arguments,
+        collate_fn: Callable[[list[Any]], Any],
+        val_split: float,
+    ) -> tuple[TensorDataLoader, TensorDataLoader]:
+        if args.bucket or args.max_tokens or args.in_memory:
+            raise RuntimeError(
+                "--stream does not support --bucket, --max-tokens or --in-memory."
+            )
+        train_set = orig_dataset.split(
+            True, val_split, args.shuffle_buffer, args.num_examples
+        )
+        val_set = orig_dataset.split(False, val_split, 0, args.num_examples)
+        return (
+            DataLoader(
+                train_set,
+                batch_size=args.batch_size,
+                collate_fn=collate_fn,
+                pin_memory=torch.cuda.is_available(),
+                num_workers=args.num_workers,
+            ),
+            DataLoader(
+                val_set,
+                batch_size=args.batch_size,
+                collate_fn=collate_fn,
+                pin_memory=torch.cuda.is_available(),
+                num_workers=args.num_workers,
+            ),
+        )
+
     def load_train_data(
         self, args: Arguments, device: torch.device, val_split: float = 0.2
     ) -> tuple[TensorDataLoader, TensorDataLoader, tuple[Any, ...]]:
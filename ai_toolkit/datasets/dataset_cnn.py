@@ -33,15 +33,24 @@ class DatasetCNN(DatasetLoader):
             [transforms.ToTensor(), transforms.Normalize((0.1307,), (0.3081,))]
         )
 
-    def load_train_data(
-        self, args: Arguments, device: torch.device, val_split: float = 0.2
-    ) -> tuple[TensorDataLoader, TensorDataLoader, tuple[Any, ...]]:
-        orig_dataset = datasets.FashionMNIST(
+    @staticmethod
+    def get_batch_tensors(orig_dataset):
+        """Applies get_transforms() to the raw uint8 images in one vectorized pass."""
+        data = orig_dataset.data.unsqueeze(1).float().div(255)
+        return transforms.Normalize((0.1307,), (0.3081,))(data), orig_dataset.targets
+
+    def load_dataset(self, train=True):
+        return datasets.FashionMNIST(
             str(self.DATA_PATH),
-            train=True,
-            download=True,
+            train=train,
+            download=train,
             transform=self.get_transforms(),
         )
+
+    def load_train_data(
+        self, args: Arguments, device: torch.device, val_split: float = 0.2
+    ) -> tuple[TensorDataLoader, TensorDataLoader, tuple[Any, ...]]:
+        orig_dataset = self.get_dataset(args, train=True)
         train_loader, val_loader = self.split_data(
             orig_dataset, args, device, val_split
         )
@@ -49,15 +58,14 @@ class DatasetCNN(DatasetLoader):
         return train_loader, val_loader, init_params
 
     def load_test_data(self, args: Arguments, device: torch.device) -> TensorDataLoader:
-        collate_fn = self.get_collate_fn(device)
-        test_set = datasets.FashionMNIST(
-            str(self.DATA_PATH), train=False, transform=self.get_transforms()
-        )
+        collate_fn = self.get_collate_fn(self.get_collate_device(args, device))
+        test_set = self.get_dataset(args, train=False)
         test_loader = DataLoader(
             test_set,
             batch_size=args.test_batch_size,
+            sampler=self.get_test_sampler(test_set),
             collate_fn=collate_fn,
             pin_memory=torch.cuda.is_available(),
             num_workers=args.num_workers,
         )
-        return test_loader
+        return self.prefetch(test_loader, args, device)
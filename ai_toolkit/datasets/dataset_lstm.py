@@ -1,26 +1,22 @@
 from __future__ import annotations
 
+import itertools
 from collections import defaultdict
 from pathlib import Path
 from typing import Any, Callable
 
 import torch
 from torch.utils.data import DataLoader
-from torch.utils.data.dataloader import default_collate
 from torch.utils.data.dataset import TensorDataset
 
 from ai_toolkit.args import Arguments
 from ai_toolkit.datasets.dataset import DatasetLoader, TensorDataLoader
+from ai_toolkit.datasets.streaming import StreamingTextDataset
 
 
 class DatasetLSTM(DatasetLoader):
     @staticmethod
-    def get_collate_fn(device: torch.device) -> Callable[[list[Any]], Any]:
-        """
-        for indices in batch_sampler:
-            yield collate_fn([dataset[i] for i in indices])
-        """
-
+    def get_batch_fn(device: torch.device) -> Callable[[Any], Any]:
         def to_device(b):
             return (
                 list(map(to_device, b))
@@ -31,32 +27,52 @@ class DatasetLSTM(DatasetLoader):
         def sort_batch(data, target):
             batch, lengths = data
             seq_lengths, perm_idx = lengths.sort(0, descending=True)
-            seq_tensor = batch[perm_idx]
+            # Trim padding to the longest sequence in the batch.
+            seq_tensor = batch[perm_idx, : seq_lengths[0]]
             target_tensor = target[perm_idx]
             return (seq_tensor.transpose(0, 1), seq_lengths), target_tensor
 
-        return lambda x: map(to_device, sort_batch(*default_collate(x)))
+        return lambda x: map(to_device, sort_batch(*x))
+
+    @staticmethod
+    def get_lengths(orig_dataset):
+        return orig_dataset.seq_lengths
+
+    @staticmethod
+    def get_batch_tensors(orig_dataset):
+        return (
+            (orig_dataset.data_tensor, orig_dataset.seq_lengths),
+            orig_dataset.target_tensor,
+        )
+
+    def load_dataset(self, train=True):
+        del train
+        return LanguageWords(self.DATA_PATH)
+
+    def load_stream(self):
+        return StreamingLanguageWords(self.DATA_PATH)
 
     def load_train_data(
         self, args: Arguments, device: torch.device, val_split: float = 0.2
     ) -> tuple[TensorDataLoader, TensorDataLoader, tuple[Any, ...]]:
-        orig_dataset = LanguageWords(self.DATA_PATH)
+        orig_dataset = self.get_dataset(args, train=True)
         train_loader, val_loader = self.split_data(
             orig_dataset, args, device, val_split
         )
         return train_loader, val_loader, orig_dataset.model_params + (device,)
 
     def load_test_data(self, args: Arguments, device: torch.device) -> TensorDataLoader:
-        collate_fn = self.get_collate_fn(device)
-        test_set = LanguageWords(self.DATA_PATH)
+        collate_fn = self.get_collate_fn(self.get_collate_device(args, device))
+        test_set = self.get_dataset(args, train=False)
         test_loader = DataLoader(
             test_set,
             batch_size=args.test_batch_size,
+            sampler=self.get_test_sampler(test_set),
             collate_fn=collate_fn,
             pin_memory=torch.cuda.is_available(),
             num_workers=args.num_workers,
         )
-        return test_loader
+        return self.prefetch(test_loader, args, device)
 
 
 class LanguageWords(TensorDataset):
@@ -126,7 +142,7 @@ class LanguageWords(TensorDataset):
 
     @staticmethod
     def load_data(data_dir):
-        token_set = set()
+        token_set: set[str] = set()
         data = defaultdict(list)
         for filepath in Path(data_dir).glob("*.txt"):
             with open(filepath) as f:
@@ -147,3 +163,40 @@ class LanguageWords(TensorDataset):
         for item in item_set:
             item2id[item] = len(item2id)
         return item2id
+
+
+class StreamingLanguageWords(StreamingTextDataset):
+    """
+    Streaming counterpart of LanguageWords. The vocabulary is built from the first
+    VOCAB_SCAN_LINES lines of every file, and rarer tokens map to UNK. Sequences
+    are truncated to the model's input width, and padded to it so that samples
+    can be collated; DatasetLSTM's batch_fn trims the padding again.
+    """
+
+    VOCAB_SCAN_LINES = 10000
+
+    def __init__(self, data_dir):
+        self.input_shape = [torch.Size((20,)), torch.Size([])]
+        super().__init__(sorted(Path(data_dir).glob("*.txt")))
+        token_set: set[str] = set()
+        for filepath in self.filenames:
+            with open(filepath, encoding="utf-8") as f:
+                for line in itertools.islice(f, self.VOCAB_SCAN_LINES):
+                    token_set.update(line.strip().lower())
+        # Sorted, so that every worker process assigns the same ids.
+        self.token2id = LanguageWords.set2id(sorted(token_set), "PAD", "UNK")
+        self.tag2id = LanguageWords.set2id([path.stem for path in self.filenames])
+
+    @property
+    def model_params(self):
+        return self.input_shape, len(self.token2id), len(self.tag2id)
+
+    def encode(self, line, label):
+        max_length = self.input_shape[0][0]
+        seq = [
+            self.token2id.get(token, self.token2id["UNK"])
+            for token in line.lower()[:max_length]
+        ]
+        seq_tensor = torch.zeros(max_length, dtype=torch.long)
+        seq_tensor[: len(seq)] = torch.tensor(seq, dtype=torch.long)
+        return (seq_tensor, torch.tensor(len(seq))), torch.tensor(label)
@@ -3,6 +3,9 @@
 # pylint: disable=too-few-public-methods
 from __future__ import annotations
 
+import contextlib
+import json
+import os
 import random
 from pathlib import Path
 from typing import Any, Callable
@@ -39,10 +42,13 @@ class DatasetPenn(DatasetLoader):
             return Compose([ToTensor(), RandomHorizontalFlip(0.5)])
         return Compose([ToTensor()])
 
+    def load_dataset(self, train=True):
+        return PennFudanDataset(self.DATA_PATH, self.get_transforms(train))
+
     def load_train_data(
         self, args: Arguments, device: torch.device, val_split: float = 0.2
     ) -> tuple[TensorDataLoader, TensorDataLoader, tuple[Any, ...]]:
-        orig_dataset = PennFudanDataset("data", self.get_transforms(train=True))
+        orig_dataset = self.get_dataset(args, train=True)
         train_loader, val_loader = self.split_data(
             orig_dataset, args, device, val_split
         )
@@ -50,16 +56,17 @@ class DatasetPenn(DatasetLoader):
         return train_loader, val_loader, init_params
 
     def load_test_data(self, args: Arguments, device: torch.device) -> TensorDataLoader:
-        collate_fn = self.get_collate_fn(device)
-        test_set = PennFudanDataset("data", self.get_transforms(train=False))
+        collate_fn = self.get_collate_fn(self.get_collate_device(args, device))
+        test_set = self.get_dataset(args, train=False)
         test_loader = DataLoader(
             test_set,
             batch_size=args.test_batch_size,
+            sampler=self.get_test_sampler(test_set),
             collate_fn=collate_fn,
             pin_memory=torch.cuda.is_available(),
             num_workers=args.num_workers,
         )
-        return test_loader
+        return self.prefetch(test_loader, args, device)
 
 
 # output = model(data, target)
@@ -113,6 +120,25 @@ class ToTensor:
 
 
 class PennFudanDataset(TensorDataset):
+    """
+    The first time a root is used, every image and mask is decoded once into a
+    cache under <root>/.penn_cache: images as one flat uint8 array, instance masks
+    run-length encoded, plus precomputed boxes. All arrays are memory-mapped, so
+    DataLoader workers share them through the page cache, and masks are only
+    decoded from their runs when an example is accessed. The cache is rebuilt
+    whenever the list of source files or their sizes or mtimes change.
+    """
+
+    CACHE_ARRAYS = (
+        "images",
+        "image_offsets",
+        "image_shapes",
+        "object_offsets",
+        "runs",
+        "run_offsets",
+        "boxes",
+    )
+
     def __init__(self, root, transform=None):
         super().__init__()
         self.root = root
@@ -120,41 +146,108 @@ class PennFudanDataset(TensorDataset):
         # load all image files, sorting them to ensure that they are aligned
         self.imgs = sorted(Path(f"{root}/PNGImages").glob("*"))
         self.masks = sorted(Path(f"{root}/PedMasks").glob("*"))
+        cache_dir = Path(root) / ".penn_cache"
+        manifest = self.get_manifest(self.imgs, self.masks)
+        manifest_path = cache_dir / "manifest.json"
+        if (
+            not manifest_path.is_file()
+            or json.loads(manifest_path.read_text()) != manifest
+        ):
+            self.build_cache(self.imgs, self.masks, cache_dir)
+            # The manifest is written last, marking the cache as complete.
+            with replace_atomically(manifest_path) as f:
+                f.write(json.dumps(manifest).encode())
+        self.cache = {
+            name: np.load(cache_dir / f"{name}.npy", mmap_mode="r")
+            for name in self.CACHE_ARRAYS
+        }
+
+    @staticmethod
+    def get_manifest(imgs, masks):
+        """Identifies the source files the cache was built from."""
+        manifest = []
+        for path in imgs + masks:
+            stat = path.stat()
+            manifest.append([path.name, stat.st_size, stat.st_mtime_ns])
+        return manifest
+
+    @staticmethod
+    def build_cache(imgs, masks, cache_dir):
+        images, image_shapes, object_counts, runs, run_lengths, boxes = (
+            [],
+            [],
+            [],
+            [],
+            [],
+            [],
+        )
+        for img_path, mask_path in zip(imgs, masks):
+            img = np.array(Image.open(img_path.resolve()).convert("RGB"))
+            images.append(img.ravel())
+            image_shapes.append(img.shape)
+
+            # note that we haven't converted the mask to RGB, because each color
+            # corresponds to a different instance with 0 being background
+            mask = np.array(Image.open(mask_path.resolve()))
+            # instances are encoded as different colors, and the first id is the
+            # background, so remove it
+            obj_ids = np.unique(mask)[1:]
+            # split the color-encoded mask into a set of binary masks
+            obj_masks = mask == obj_ids[:, None, None]
+            object_counts.append(len(obj_ids))
+            for obj_mask in obj_masks:
+                obj_runs = rle_encode(obj_mask)
+                runs.append(obj_runs)
+                run_lengths.append(len(obj_runs))
+
+            # get bounding box coordinates for each mask
+            rows, cols = obj_masks.any(axis=2), obj_masks.any(axis=1)
+            height, width = mask.shape
+            boxes.append(
+                np.stack(
+                    [
+                        cols.argmax(axis=1),
+                        rows.argmax(axis=1),
+                        width - 1 - cols[:, ::-1].argmax(axis=1),
+                        height - 1 - rows[:, ::-1].argmax(axis=1),
+                    ],
+                    axis=1,
+                )
+            )
+
+        cache_dir.mkdir(exist_ok=True)
+        arrays = {
+            "images": np.concatenate(images),
+            "image_offsets": np.cumsum([0] + [len(img) for img in images]),
+            "image_shapes": np.array(image_shapes, dtype=np.int64),
+            "object_offsets": np.cumsum([0] + object_counts),
+            "runs": np.concatenate([np.zeros(0, dtype=np.int64), *runs]),
+            "run_offsets": np.cumsum([0] + run_lengths),
+            "boxes": np.concatenate([np.zeros((0, 4)), *boxes]).astype(np.float32),
+        }
+        for name in PennFudanDataset.CACHE_ARRAYS:
+            with replace_atomically(cache_dir / f"{name}.npy") as f:
+                np.save(f, arrays[name])
 
     def __getitem__(self, idx):
-        # load images and masks
-        img_path = self.imgs[idx].resolve()
-        mask_path = self.masks[idx].resolve()
-        img = Image.open(img_path).convert("RGB")
-        # note that we haven't converted the mask to RGB, because each color corresponds
-        # to a different instance with 0 being background
-        mask = Image.open(mask_path)
-
-        mask = np.array(mask)
-        # instances are encoded as different colors
-        obj_ids = np.unique(mask)
-        # first id is the background, so remove it
-        obj_ids = obj_ids[1:]
-
-        # split the color-encoded mask into a set
-        # of binary masks
-        masks = mask == obj_ids[:, None, None]
-
-        # get bounding box coordinates for each mask
-        num_objs = len(obj_ids)
-        box = []
-        for i in range(num_objs):
-            pos = np.where(masks[i])
-            xmin = np.min(pos[1])
-            xmax = np.max(pos[1])
-            ymin = np.min(pos[0])
-            ymax = np.max(pos[0])
-            box.append([xmin, ymin, xmax, ymax])
-
-        boxes = torch.as_tensor(box, dtype=torch.float32)
+        cache = self.cache
+        height, width, channels = cache["image_shapes"][idx]
+        img_start, img_end = cache["image_offsets"][idx : idx + 2]
+        img = np.array(cache["images"][img_start:img_end]).reshape(
+            height, width, channels
+        )
+
+        obj_start, obj_end = cache["object_offsets"][idx : idx + 2]
+        num_objs = obj_end - obj_start
+        run_offsets = cache["run_offsets"][obj_start : obj_end + 1]
+        mask_array = np.zeros((num_objs, height, width), dtype=bool)
+        for i, (start, end) in enumerate(zip(run_offsets[:-1], run_offsets[1:])):
+            mask_array[i] = rle_decode(cache["runs"][start:end], (height, width))
+
+        boxes = torch.tensor(cache["boxes"][obj_start:obj_end])
         # there is only one class
         labels = torch.ones((num_objs,), dtype=torch.int64)
-        masks = torch.as_tensor(masks, dtype=torch.uint8)
+        masks = torch.as_tensor(mask_array, dtype=torch.uint8)
 
         image_id = torch.tensor([idx])
         area = (boxes[:, 3] - boxes[:, 1]) * (boxes[:, 2] - boxes[:, 0])
@@ -176,3 +269,31 @@ class PennFudanDataset(TensorDataset):
 
     def __len__(self):
         return len(self.imgs)
+
+
+@contextlib.contextmanager
+def replace_atomically(path):
+    """
+    Yields a temp file that then replaces path. Every DDP rank may build the cache
+    at once, so each writes its own temp file; a file that another rank has
+    memory-mapped is replaced by a new one, never rewritten in place.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        yield f
+    os.replace(tmp_path, path)
+
+
+def rle_encode(mask):
+    """Run lengths of the flattened mask, alternating 0s and 1s, starting with 0s."""
+    flat = mask.ravel()
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    runs = np.diff(np.concatenate([[0], changes, [flat.size]]))
+    if flat[0]:
+        runs = np.concatenate([[0], runs])
+    return runs
+
+
+def rle_decode(runs, shape):
+    values = np.arange(len(runs)) % 2 == 1
+    return np.repeat(values, runs).reshape(shape)
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import random
 import string
 import unicodedata
@@ -7,14 +9,15 @@ import zipfile
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import torch
-import wget  # type: ignore[import]
 from torch.nn.utils.rnn import pad_sequence
 from torch.utils.data import DataLoader
 from torch.utils.data.dataset import TensorDataset
 
 from ai_toolkit.args import Arguments
 from ai_toolkit.datasets.dataset import DatasetLoader, TensorDataLoader
+from ai_toolkit.datasets.streaming import StreamingTextDataset
 
 DATA_URL = "https://download.pytorch.org/tutorial/data.zip"
 ALL_LETTERS = string.ascii_letters + " .,;'"
@@ -29,26 +32,42 @@ class DatasetRNN(DatasetLoader):
         yy_pad = torch.stack(yy)
         return xx_pad, yy_pad, x_lens
 
+    @staticmethod
+    def get_lengths(orig_dataset):
+        return orig_dataset.lengths
+
+    @staticmethod
+    def get_batch_tensors(orig_dataset):
+        return orig_dataset.data_tensor, orig_dataset.labels
+
+    def load_dataset(self, train=True):
+        del train
+        return LanguageWords(self.DATA_PATH)
+
+    def load_stream(self):
+        return StreamingLanguageWords(self.DATA_PATH)
+
     def load_train_data(
         self, args: Arguments, device: torch.device, val_split: float = 0.2
     ) -> tuple[TensorDataLoader, TensorDataLoader, tuple[Any, ...]]:
-        orig_dataset = LanguageWords(self.DATA_PATH)
+        orig_dataset = self.get_dataset(args, train=True)
         train_loader, val_loader = self.split_data(
             orig_dataset, args, device, val_split
         )
         return train_loader, val_loader, orig_dataset.model_params
 
     def load_test_data(self, args: Arguments, device: torch.device) -> TensorDataLoader:
-        collate_fn = self.get_collate_fn(device)
-        test_set = LanguageWords(self.DATA_PATH)
+        collate_fn = self.get_collate_fn(self.get_collate_device(args, device))
+        test_set = self.get_dataset(args, train=False)
         test_loader = DataLoader(
             test_set,
             batch_size=args.test_batch_size,
+            sampler=self.get_test_sampler(test_set),
             collate_fn=collate_fn,
             pin_memory=torch.cuda.is_available(),
             num_workers=args.num_workers,
         )
-        return test_loader
+        return self.prefetch(test_loader, args, device)
 
 
 # def pad_collate(batch):
@@ -61,47 +80,53 @@ class DatasetRNN(DatasetLoader):
 
 
 class LanguageWords(TensorDataset):
-    """Dataset for training a model on a dataset."""
+    """
+    Dataset for training a model on a dataset. The whole corpus is encoded once
+    into padded letter-index, length and label tensors, which are cached on disk
+    next to the data, keyed by a hash of the source files and ALL_LETTERS.
+    """
 
     def __init__(self, data_path):
         super().__init__()
         self.input_shape = torch.Size((1, 19))
-        self.all_categories = []
-        self.data = []
-
-        data_dir = data_path / data_path / "names/"
-        if not data_dir.is_dir():
-            output_zip = wget.download(DATA_URL, str(data_path))
-            with zipfile.ZipFile(output_zip) as zip_ref:
-                zip_ref.extractall(data_path)
-            Path(output_zip).unlink()
 
-        # Build the category_lines dictionary, a list of names per language
-        for filename in data_dir.glob("*.txt"):
-            category = filename.stem
-            self.all_categories.append(category)
-            lines = self.read_lines(filename)
-            for word in lines:
-                self.data.append((word, category))
-
-        if not self.data:
+        data_dir = self.get_data_dir(data_path)
+        # Sorted, so that label ids match StreamingLanguageWords and the cache key
+        # does not depend on the order the filesystem lists files in.
+        filenames = sorted(data_dir.glob("*.txt"))
+        cache_path = data_dir / f".cache_{self.get_cache_key(filenames)}.pt"
+        if cache_path.is_file():
+            cache = torch.load(cache_path)
+        else:
+            cache = self.encode_corpus(filenames)
+            # Every rank may build the cache at once, so each writes its own temp
+            # file, and the rename means a reader never sees a partial cache.
+            tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+            torch.save(cache, tmp_path)
+            os.replace(tmp_path, cache_path)
+
+        if len(cache["labels"]) == 0:
             raise RuntimeError("Data could not be loaded.")
+        self.all_categories = cache["all_categories"]
         self.n_categories = len(self.all_categories)
         self.n_letters = len(ALL_LETTERS)
         self.n_hidden = 128
-        self.max_word_length = len(max(self.data, key=lambda x: len(x[0]))[0])
+        self.max_word_length = cache["letters"].size(1)
 
-        random.shuffle(self.data)
+        # Shuffling an index list consumes the same randomness as shuffling the
+        # examples themselves, so the order matches the previous implementation.
+        order = list(range(len(cache["labels"])))
+        random.shuffle(order)
+        order_tensor = torch.tensor(order)
+        self.lengths = cache["lengths"][order_tensor]
+        self.labels = cache["labels"][order_tensor]
+        self.data_tensor = cache["letters"][order_tensor].float().unsqueeze(1)
 
     def __len__(self) -> int:
-        return len(self.data)
+        return len(self.labels)
 
     def __getitem__(self, index: int) -> tuple[torch.Tensor, torch.Tensor]:
-        line, category = self.data[index]
-        category_tensor = torch.tensor([self.all_categories.index(category)])
-        line_tensor = self.lineToTensor(line)
-        # torch.tensor([ALL_LETTERS.index(letter) for letter in line])
-        return line_tensor, category_tensor.squeeze()
+        return self.data_tensor[index], self.labels[index]
 
     @property
     def model_params(self) -> tuple[Any, ...]:
@@ -109,20 +134,85 @@ class LanguageWords(TensorDataset):
         # , self.n_letters
 
     @staticmethod
-    def read_lines(filename: Path) -> list[str]:
-        def unicodeToAscii(s: str) -> str:
-            return "".join(
-                c
-                for c in unicodedata.normalize("NFD", s)
-                if unicodedata.category(c) != "Mn" and c in ALL_LETTERS
-            )
+    def get_data_dir(data_path: Path) -> Path:
+        data_dir = data_path / data_path / "names/"
+        if not data_dir.is_dir():
+            # pylint: disable-next=import-outside-toplevel
+            import wget  # type: ignore[import]
 
+            output_zip = wget.download(DATA_URL, str(data_path))
+            with zipfile.ZipFile(output_zip) as zip_ref:
+                zip_ref.extractall(data_path)
+            Path(output_zip).unlink()
+        return data_dir
+
+    @staticmethod
+    def get_cache_key(filenames: list[Path]) -> str:
+        digest = hashlib.sha1(ALL_LETTERS.encode())
+        for filename in filenames:
+            digest.update(filename.name.encode())
+            digest.update(filename.read_bytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def encode_corpus(cls, filenames: list[Path]) -> dict[str, Any]:
+        all_categories, lines, labels = [], [], []
+        for i, filename in enumerate(filenames):
+            all_categories.append(filename.stem)
+            file_lines = cls.read_lines(filename)
+            lines += file_lines
+            labels += [i] * len(file_lines)
+        return {
+            "all_categories": all_categories,
+            "letters": cls.encode_lines(lines),
+            "lengths": torch.tensor([len(line) for line in lines]),
+            "labels": torch.tensor(labels),
+        }
+
+    @staticmethod
+    def encode_lines(lines: list[str]) -> torch.Tensor:
+        """Maps letters to their ALL_LETTERS index with one lookup-table gather."""
+        max_len = max((len(line) for line in lines), default=0)
+        lookup = np.zeros(128, dtype=np.int64)
+        lookup[[ord(letter) for letter in ALL_LETTERS]] = range(len(ALL_LETTERS))
+        padded = "".join(line.ljust(max_len, "\0") for line in lines).encode("ascii")
+        codes = lookup[np.frombuffer(padded, dtype=np.uint8)]
+        return torch.from_numpy(codes.reshape(len(lines), max_len))
+
+    @staticmethod
+    def unicode_to_ascii(s: str) -> str:
+        return "".join(
+            c
+            for c in unicodedata.normalize("NFD", s)
+            if unicodedata.category(c) != "Mn" and c in ALL_LETTERS
+        )
+
+    @classmethod
+    def read_lines(cls, filename: Path) -> list[str]:
         with open(filename, encoding="utf-8") as f:
             lines = f.read().strip().split("\n")
-            return [unicodeToAscii(line) for line in lines]
+            return [cls.unicode_to_ascii(line) for line in lines]
+
+
+class StreamingLanguageWords(StreamingTextDataset):
+    """
+    Streaming counterpart of LanguageWords. Words are padded or truncated to the
+    model's input width, since the longest word is not known in advance.
+    """
+
+    def __init__(self, data_path):
+        self.input_shape = torch.Size((1, 19))
+        super().__init__(sorted(LanguageWords.get_data_dir(data_path).glob("*.txt")))
+        self.all_categories = [filename.stem for filename in self.filenames]
+        self.n_categories = len(self.all_categories)
+        self.n_hidden = 128
+        self.max_word_length = self.input_shape[-1]
+
+    @property
+    def model_params(self) -> tuple[Any, ...]:
+        return self.input_shape, self.max_word_length, self.n_hidden, self.n_categories
 
-    def lineToTensor(self, line: str) -> torch.Tensor:
-        tensor = torch.zeros((1, self.max_word_length))
-        for li, letter in enumerate(line):
-            tensor[0][li] = ALL_LETTERS.index(letter)
-        return tensor
+    def encode(self, line: str, label: int) -> tuple[torch.Tensor, torch.Tensor]:
+        word = LanguageWords.unicode_to_ascii(line)[: self.max_word_length]
+        letters = LanguageWords.encode_lines([word.ljust(self.max_word_length, "\0")])
+        return letters.float(), torch.tensor(label)
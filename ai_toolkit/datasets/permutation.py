@@ -0,0 +1,152 @@
+"""
+Keyed permutations of range(n) that are computed on demand, one position at a
+time, instead of being materialized with torch.randperm. A 4-round Feistel network
+is a bijection on [0, 4^k) for any round function, and cycle walking (re-applying
+it until the result falls below n) restricts it to a bijection on [0, n).
+"""
+from __future__ import annotations
+
+from typing import Any, Iterator, Sized
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Sampler
+
+from ai_toolkit import distributed
+
+MASK64 = (1 << 64) - 1
+NUM_ROUNDS = 4
+CHUNK_SIZE = 4096
+
+
+def splitmix64(x: int) -> int:
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+class FeistelPermutation:
+    """permutation[i] is the element at position i of a shuffle of range(n)."""
+
+    def __init__(self, n: int, *key: int) -> None:
+        self.n = n
+        self.half_bits = max(1, ((n - 1).bit_length() + 1) // 2)
+        self.half_mask = np.uint64((1 << self.half_bits) - 1)
+        state = 0
+        for part in key:
+            state = splitmix64(state ^ (part & MASK64))
+        self.round_keys = []
+        for _ in range(NUM_ROUNDS):
+            state = splitmix64(state)
+            self.round_keys.append(np.uint64(state))
+
+    def round_function(self, x: np.ndarray, key: np.uint64) -> np.ndarray:
+        # splitmix64's finalizer; uint64 arithmetic wraps around.
+        x = x ^ key
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        result: np.ndarray = (x ^ (x >> np.uint64(31))) & self.half_mask
+        return result
+
+    def encrypt(self, x: np.ndarray) -> np.ndarray:
+        left, right = x >> np.uint64(self.half_bits), x & self.half_mask
+        for key in self.round_keys:
+            left, right = right, left ^ self.round_function(right, key)
+        return (left << np.uint64(self.half_bits)) | right
+
+    def permute(self, positions: np.ndarray) -> np.ndarray:
+        result = self.encrypt(positions.astype(np.uint64))
+        # The domain is less than 4n, so this rarely takes more than a few passes.
+        outside = result >= self.n
+        while outside.any():
+            result[outside] = self.encrypt(result[outside])
+            outside = result >= self.n
+        return result.astype(np.int64)
+
+    def __getitem__(self, position: int) -> int:
+        if not 0 <= position < self.n:
+            raise IndexError(position)
+        return int(self.permute(np.array([position]))[0])
+
+    def __len__(self) -> int:
+        return self.n
+
+    def iter_range(self, start: int, stop: int, step: int = 1) -> Iterator[int]:
+        for chunk_start in range(start, stop, CHUNK_SIZE * step):
+            chunk_stop = min(stop, chunk_start + CHUNK_SIZE * step)
+            positions = np.arange(chunk_start, chunk_stop, step)
+            yield from self.permute(positions).tolist()
+
+
+class PermutationSubset(Dataset[Any]):
+    """
+    Positions [start, start + length) of a FeistelPermutation of a dataset, the
+    lazy counterpart of one part of random_split.
+    """
+
+    def __init__(
+        self,
+        dataset: Dataset[Any],
+        permutation: FeistelPermutation,
+        start: int,
+        length: int,
+    ) -> None:
+        self.dataset = dataset
+        self.permutation = permutation
+        self.start = start
+        self.length = length
+
+    def __getitem__(self, index: int) -> Any:
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        return self.dataset[self.permutation[self.start + index]]
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def indices(self) -> torch.Tensor:
+        """Materializes the subset's indices, for loaders that need all of them."""
+        positions = np.arange(self.start, self.start + self.length)
+        return torch.from_numpy(self.permutation.permute(positions))
+
+
+class PermutationSampler(Sampler[int]):
+    """
+    Shuffling sampler whose order for each epoch is a FeistelPermutation keyed by
+    (seed, epoch), so it never holds more than one chunk of indices. Each rank takes
+    every world_size-th position, and the tail that does not divide evenly is
+    dropped so every rank runs the same number of steps. seek(position) makes the
+    next iteration start at that position of the rank's order, e.g. to resume a
+    mid-epoch checkpoint.
+    """
+
+    def __init__(self, data_source: Sized, seed: int = 0) -> None:
+        self.num_examples = len(data_source)
+        self.seed = seed
+        self.epoch = 0
+        self.start = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def seek(self, position: int) -> None:
+        self.start = position
+
+    def num_samples(self) -> int:
+        return self.num_examples // distributed.get_world_size()
+
+    def __iter__(self) -> Iterator[int]:
+        permutation = FeistelPermutation(self.num_examples, self.seed, self.epoch)
+        world_size = distributed.get_world_size()
+        start, self.start = self.start, 0
+        yield from permutation.iter_range(
+            distributed.get_rank() + start * world_size,
+            self.num_samples() * world_size,
+            world_size,
+        )
+
+    def __len__(self) -> int:
+        # Seeking skips part of an epoch without changing its length.
+        return self.num_samples()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import itertools
+import queue
+import threading
+from typing import Any, Iterator
+
+import torch
+
+# Sentinel placed on the queue once the wrapped loader is exhausted.
+END = object()
+
+
+def to_device(batch: Any, device: torch.device, pin: bool) -> Any:
+    if isinstance(batch, torch.Tensor):
+        if pin and not batch.is_pinned():
+            batch = batch.pin_memory()
+        return batch.to(device, non_blocking=pin)
+    if isinstance(batch, dict):
+        return {k: to_device(v, device, pin) for k, v in batch.items()}
+    if isinstance(batch, (list, tuple, map)):
+        # batch_fn may return a lazy map, so it is evaluated on the producer thread.
+        return [to_device(b, device, pin) for b in batch]
+    return batch
+
+
+def record_stream(batch: Any, stream: torch.cuda.Stream) -> None:
+    """Tells the caching allocator that the batch is used outside its copy stream."""
+    if isinstance(batch, torch.Tensor):
+        batch.record_stream(stream)
+    elif isinstance(batch, dict):
+        for b in batch.values():
+            record_stream(b, stream)
+    elif isinstance(batch, list):
+        for b in batch:
+            record_stream(b, stream)
+
+
+class PrefetchLoader:
+    """
+    Wraps a TensorDataLoader so the next `depth` batches are produced on a
+    background thread while the current batch is being used. The thread also moves
+    each batch to the device: on CUDA, from pinned memory with non_blocking copies
+    on a separate stream, which the consuming stream waits on before using a batch.
+
+    With num_workers=0, dataset transforms also run on the background thread. Random
+    augmentations, e.g. DatasetPenn's random flip, then draw from the global random
+    and torch RNGs while the training loop uses them too, so their results depend
+    on thread timing and are not reproducible. Use num_workers > 0, where each
+    worker process has its own seeded RNGs, when augmentation must be deterministic.
+    """
+
+    def __init__(self, loader: Any, depth: int, device: torch.device) -> None:
+        self.loader = loader
+        self.depth = depth
+        self.device = device
+        self.use_cuda = device.type == "cuda"
+        self.sampler = loader.sampler
+        self.dataset = getattr(loader, "dataset", None)
+        self.batch_sampler = getattr(loader, "batch_sampler", None)
+
+    def __len__(self) -> int:
+        return len(self.loader)
+
+    @staticmethod
+    def put(batches: queue.Queue[Any], stop: threading.Event, item: Any) -> bool:
+        """Blocks until there is room on the queue, unless the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce(
+        self, iterator: Iterator[Any], batches: queue.Queue[Any], stop: threading.Event
+    ) -> None:
+        stream = torch.cuda.Stream(self.device) if self.use_cuda else None
+        try:
+            for batch in iterator:
+                event = None
+                with torch.cuda.stream(stream):  # a None stream is a no-op
+                    batch = to_device(batch, self.device, self.use_cuda)
+                    if stream is not None:
+                        event = torch.cuda.Event()
+                        event.record(stream)
+                if not self.put(batches, stop, (batch, event)):
+                    return
+            self.put(batches, stop, (END, None))
+        except Exception as e:  # pylint: disable=broad-except
+            self.put(batches, stop, (e, None))
+
+    def __iter__(self) -> Iterator[Any]:
+        batches: queue.Queue[Any] = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        # Samplers draw their shuffling seed from the global RNG when the first batch
+        # is requested. Fetching it on this thread keeps that draw in the same order
+        # relative to the training loop's own RNG use as without prefetching.
+        iterator = iter(self.loader)
+        first_batch = list(itertools.islice(iterator, 1))
+        thread = threading.Thread(
+            target=self.produce,
+            args=(itertools.chain(first_batch, iterator), batches, stop),
+            daemon=True,
+        )
+        thread.start()
+        try:
+            while True:
+                batch, event = batches.get()
+                if batch is END:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                if event is not None:
+                    current_stream = torch.cuda.current_stream(self.device)
+                    event.wait(current_stream)
+                    record_stream(batch, current_stream)
+                yield batch
+        finally:
+            # Unblocks the producer if iteration stops early, e.g. after one batch.
+            stop.set()
+            thread.join()
+
+
+def prefetch(loader: Any, depth: int, device: torch.device) -> Any:
+    return PrefetchLoader(loader, depth, device) if depth > 0 else loader
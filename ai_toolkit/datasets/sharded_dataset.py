@@ -0,0 +1,169 @@
+"""
+Datasets packed by pack.py into fixed-size shards of already-transformed samples.
+Each sample is flattened into a list of tensor fields. Within a shard, a field whose
+shape is the same for every sample is stored as one stacked array, and any other
+field is stored flat, with offsets and shapes to index it. Every array is a .npy
+file, which is memory-mapped when read.
+
+Layout: <dir>/index.json, <dir>/metadata.pkl, <dir>/lengths.npy (optional),
+        <dir>/shard_<k>_<field>.npy, shard_<k>_<field>_offsets.npy, ...
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import pickle
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+from torch.utils.data.dataset import TensorDataset
+
+
+def flatten(sample: Any, fields: list[np.ndarray]) -> Any:
+    """Appends the leaves of sample to fields and returns the structure of sample."""
+    if isinstance(sample, dict):
+        return {"dict": {k: flatten(v, fields) for k, v in sample.items()}}
+    if isinstance(sample, (list, tuple)):
+        return {"list": [flatten(v, fields) for v in sample]}
+    fields.append(np.asarray(sample))
+    return len(fields) - 1
+
+
+def unflatten(structure: Any, fields: list[torch.Tensor]) -> Any:
+    if isinstance(structure, int):
+        return fields[structure]
+    if "dict" in structure:
+        return {k: unflatten(v, fields) for k, v in structure["dict"].items()}
+    return tuple(unflatten(v, fields) for v in structure["list"])
+
+
+def write_shards(
+    dataset: Dataset[Any],
+    out_dir: Path,
+    shard_size: int,
+    num_workers: int = 0,
+    lengths: torch.Tensor | None = None,
+    metadata: dict[str, Any] | None = None,
+) -> None:
+    """Runs every __getitem__ of dataset once and writes the samples as shards."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    loader = DataLoader(
+        dataset, batch_size=shard_size, collate_fn=list, num_workers=num_workers
+    )
+    structure = None
+    shards = []
+    for k, samples in enumerate(loader):
+        flat_samples: list[list[np.ndarray]] = []
+        for sample in samples:
+            fields: list[np.ndarray] = []
+            structure = flatten(sample, fields)
+            flat_samples.append(fields)
+
+        shard_fields: list[dict[str, list[int] | None]] = []
+        for j, values in enumerate(zip(*flat_samples)):
+            prefix = out_dir / f"shard_{k:05d}_{j}"
+            shapes = [value.shape for value in values]
+            if len(set(shapes)) == 1:
+                np.save(f"{prefix}.npy", np.stack(values))
+                shard_fields.append({"shape": list(shapes[0])})
+            else:
+                sizes = [value.size for value in values]
+                np.save(f"{prefix}.npy", np.concatenate([v.ravel() for v in values]))
+                np.save(f"{prefix}_offsets.npy", np.cumsum([0] + sizes))
+                np.save(f"{prefix}_shapes.npy", np.array(shapes, dtype=np.int64))
+                shard_fields.append({"shape": None})
+        shards.append({"num_examples": len(samples), "fields": shard_fields})
+
+    if lengths is not None:
+        np.save(out_dir / "lengths.npy", lengths.numpy())
+    with open(out_dir / "metadata.pkl", "wb") as f:
+        pickle.dump(metadata or {}, f)
+    # index.json is written last, marking the directory as complete.
+    with open(out_dir / "index.json", "w") as f:
+        json.dump({"structure": structure, "shards": shards}, f)
+
+
+class ShardedDataset(TensorDataset):
+    """
+    Map-style dataset over a directory written by write_shards. Samples have the
+    same structure as the packed dataset's samples, with every leaf as a tensor.
+    """
+
+    def __init__(self, shard_dir: Path) -> None:
+        super().__init__()
+        self.shard_dir = Path(shard_dir)
+        index_path = self.shard_dir / "index.json"
+        if not index_path.is_file():
+            raise RuntimeError(f"No packed dataset found in {self.shard_dir}")
+        with open(index_path) as f:
+            index = json.load(f)
+        with open(self.shard_dir / "metadata.pkl", "rb") as f:
+            self.metadata: dict[str, Any] = pickle.load(f)
+        self.structure = index["structure"]
+        self.shards = index["shards"]
+        self.shard_starts = np.cumsum(
+            [0] + [shard["num_examples"] for shard in self.shards]
+        ).tolist()
+        lengths_path = self.shard_dir / "lengths.npy"
+        self.lengths = (
+            torch.from_numpy(np.load(lengths_path)) if lengths_path.is_file() else None
+        )
+        self.arrays: dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return int(self.shard_starts[-1])
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += len(self)
+        k = bisect.bisect_right(self.shard_starts, index) - 1
+        j = index - self.shard_starts[k]
+        fields = []
+        for field, field_info in enumerate(self.shards[k]["fields"]):
+            values = self.load_array(f"shard_{k:05d}_{field}")
+            if field_info["shape"] is not None:
+                value = values[j]
+            else:
+                offsets = self.load_array(f"shard_{k:05d}_{field}_offsets")
+                shape = self.load_array(f"shard_{k:05d}_{field}_shapes")[j]
+                value = values[offsets[j] : offsets[j + 1]].reshape(shape)
+            # Copy out of the read-only mapping, so transforms can modify samples.
+            fields.append(torch.from_numpy(np.array(value)))
+        return unflatten(self.structure, fields)
+
+    @property
+    def model_params(self) -> tuple[Any, ...]:
+        if "model_params" not in self.metadata:
+            raise RuntimeError(f"{self.shard_dir} was packed without model_params")
+        return tuple(self.metadata["model_params"])
+
+    def load_array(self, name: str) -> np.ndarray:
+        if name not in self.arrays:
+            self.arrays[name] = np.load(self.shard_dir / f"{name}.npy", mmap_mode="r")
+        return self.arrays[name]
+
+    def get_tensors(self) -> Any:
+        """
+        Returns the whole dataset collated into tensors, for TensorBatchLoader.
+        This is only possible when each field has the same shape in every shard.
+        """
+        num_fields = len(self.shards[0]["fields"]) if self.shards else 0
+        fields = []
+        for field in range(num_fields):
+            shapes = {str(shard["fields"][field]["shape"]) for shard in self.shards}
+            if len(shapes) != 1 or "None" in shapes:
+                raise RuntimeError("Variable-size fields cannot be loaded in memory.")
+            fields.append(
+                torch.from_numpy(
+                    np.concatenate(
+                        [
+                            self.load_array(f"shard_{k:05d}_{field}")
+                            for k in range(len(self.shards))
+                        ]
+                    )
+                )
+            )
+        return unflatten(self.structure, fields)
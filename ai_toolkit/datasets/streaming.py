@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import copy
+import itertools
+import random
+import zlib
+from pathlib import Path
+from typing import Any, Iterator
+
+from torch.utils.data import IterableDataset, get_worker_info
+
+from ai_toolkit import distributed
+
+
+class StreamingTextDataset(IterableDataset):  # type: ignore[type-arg]
+    """
+    Streams (line, label) examples from text files, where the label of a line is
+    the index of its file, without ever holding a file in memory. Subclasses turn
+    each example into a sample in encode().
+
+    Files are split between distributed ranks and DataLoader workers, or, when there
+    are fewer files than readers, every file is split into one byte range per
+    reader, each starting at a line boundary. A reader interleaves its files line by
+    line, with at most MAX_OPEN_FILES of them open at once; the next file is opened
+    whenever one is exhausted. A line goes to the validation split
+    when its hash falls below val_split, so the split is the same on every run, and
+    duplicate lines never end up on both sides. Training examples are shuffled
+    through a buffer of shuffle_buffer examples, seeded from (seed, epoch, reader).
+    """
+
+    MAX_OPEN_FILES = 64
+
+    def __init__(self, filenames: list[Path]) -> None:
+        super().__init__()
+        self.filenames = filenames
+        self.train = True
+        self.val_split = 0.0
+        self.shuffle_buffer = 0
+        self.max_examples: int | None = None
+        self.seed = 0
+        self.epoch = 0
+
+    def encode(self, line: str, label: int) -> Any:
+        raise NotImplementedError
+
+    def split(
+        self,
+        train: bool,
+        val_split: float,
+        shuffle_buffer: int = 0,
+        max_examples: int | None = None,
+    ) -> StreamingTextDataset:
+        """Returns the train or validation part of this dataset."""
+        result = copy.copy(self)
+        result.train = train
+        result.val_split = val_split
+        result.shuffle_buffer = shuffle_buffer if train else 0
+        result.max_examples = max_examples
+        return result
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    @staticmethod
+    def get_reader() -> tuple[int, int]:
+        worker_info = get_worker_info()
+        worker_id, num_workers = (
+            (0, 1) if worker_info is None else (worker_info.id, worker_info.num_workers)
+        )
+        reader = distributed.get_rank() * num_workers + worker_id
+        return reader, distributed.get_world_size() * num_workers
+
+    def in_split(self, line: str) -> bool:
+        is_val = zlib.crc32(line.encode()) < self.val_split * 2**32
+        return is_val != self.train
+
+    def read_lines(
+        self, rng: random.Random, reader: int, num_readers: int
+    ) -> Iterator[tuple[str, int]]:
+        files = list(enumerate(self.filenames))
+        num_parts, part = 1, 0
+        if len(files) >= num_readers:
+            files = files[reader::num_readers]
+        else:
+            num_parts, part = num_readers, reader
+        if self.shuffle_buffer:
+            rng.shuffle(files)
+
+        def file_lines(label: int, filename: Path) -> Iterator[tuple[str, int]]:
+            # Text files are read lazily, a buffered chunk at a time. A line belongs
+            # to the part that holds its first byte.
+            size = filename.stat().st_size
+            start, end = size * part // num_parts, size * (part + 1) // num_parts
+            with open(filename, "rb") as f:
+                position = start
+                if start > 0:
+                    # Skips the rest of the line that began in the previous part.
+                    f.seek(start - 1)
+                    position += len(f.readline()) - 1
+                while position < end:
+                    raw_line = f.readline()
+                    if not raw_line:
+                        break
+                    position += len(raw_line)
+                    line = raw_line.decode("utf-8").strip()
+                    if line and self.in_split(line):
+                        yield line, label
+
+        pending = (file_lines(label, filename) for label, filename in files)
+        streams = list(itertools.islice(pending, self.MAX_OPEN_FILES))
+        while streams:
+            for stream in list(streams):
+                example = next(stream, None)
+                if example is None:
+                    streams.remove(stream)
+                    streams.extend(itertools.islice(pending, 1))
+                else:
+                    yield example
+
+    def __iter__(self) -> Iterator[Any]:
+        reader, num_readers = self.get_reader()
+        rng = random.Random(f"{self.seed}-{self.epoch}-{reader}")
+        examples = self.read_lines(rng, reader, num_readers)
+        if self.max_examples is not None:
+            examples = itertools.islice(examples, -(-self.max_examples // num_readers))
+
+        buffer: list[tuple[str, int]] = []
+        for example in examples:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(example)
+                continue
+            if buffer:
+                j = rng.randrange(len(buffer))
+                example, buffer[j] = buffer[j], example
+            yield self.encode(*example)
+        rng.shuffle(buffer)
+        for example in buffer:
+            yield self.encode(*example)
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Iterator, Sequence
+
+import torch
+from torch.utils.data import TensorDataset
+from torch.utils.data.dataloader import default_collate
+
+from ai_toolkit import distributed
+
+
+def materialize(dataset: TensorDataset) -> Any:
+    """
+    Collates every example of a map-style dataset into one batch, paying the
+    per-item __getitem__ cost once instead of once per epoch.
+    """
+    return default_collate([dataset[i] for i in range(len(dataset))])
+
+
+def index_select(tensors: Any, index: torch.Tensor) -> Any:
+    if isinstance(tensors, (list, tuple)):
+        return [index_select(t, index) for t in tensors]
+    return tensors.index_select(0, index)
+
+
+class TensorBatchLoader:
+    """
+    Drop-in replacement for TensorDataLoader when the whole dataset fits in memory.
+    `tensors` is the (possibly nested) collated dataset, and each batch is produced
+    by one index_select per tensor on a shuffled permutation of `indices`, then
+    passed through batch_fn, which plays the role of collate_fn after collation.
+    Like PermutationSampler, each epoch is shuffled with a generator seeded from
+    (seed, epoch), and every rank takes every world_size-th index of it.
+    """
+
+    def __init__(
+        self,
+        tensors: Any,
+        indices: Sequence[int],
+        batch_size: int,
+        batch_fn: Callable[[Any], Any],
+        shuffle: bool = False,
+        seed: int = 0,
+    ) -> None:
+        self.tensors = tensors
+        self.indices = torch.as_tensor(indices, dtype=torch.long)
+        self.batch_size = batch_size
+        self.batch_fn = batch_fn
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.sampler = None
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def get_indices(self) -> torch.Tensor:
+        indices = self.indices
+        world_size = distributed.get_world_size()
+        if self.shuffle:
+            generator = torch.Generator().manual_seed(self.seed + self.epoch)
+            indices = indices[torch.randperm(len(indices), generator=generator)]
+            # Every rank must run the same number of training steps.
+            indices = indices[: len(indices) // world_size * world_size]
+        # Like ShardSampler, every rank takes every world_size-th index.
+        return indices[distributed.get_rank() :: world_size]
+
+    def __len__(self) -> int:
+        num_indices, world_size = len(self.indices), distributed.get_world_size()
+        if self.shuffle:
+            num_indices = num_indices // world_size * world_size
+        num_samples = len(range(distributed.get_rank(), num_indices, world_size))
+        return -(-num_samples // self.batch_size)
+
+    def __iter__(self) -> Iterator[Any]:
+        for batch_indices in self.get_indices().split(self.batch_size):
+            yield self.batch_fn(index_select(self.tensors, batch_indices))
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import socket
+from typing import Any, Callable
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.optim as optim
+
+BACKEND = "gloo"
+
+
+def is_initialized() -> bool:
+    return dist.is_available() and dist.is_initialized()
+
+
+def get_rank() -> int:
+    return dist.get_rank() if is_initialized() else 0
+
+
+def get_world_size() -> int:
+    return dist.get_world_size() if is_initialized() else 1
+
+
+def is_main_process() -> bool:
+    """Only rank 0 writes the SummaryWriter, args.json and checkpoints."""
+    return get_rank() == 0
+
+
+def launch(fn: Callable[..., Any], arg_list: tuple[str, ...], nproc: int) -> Any:
+    """
+    Runs fn(*arg_list) on nproc processes connected by a gloo process group on
+    localhost. The calling process becomes rank 0, so its return value is returned;
+    its thread count and environment are restored afterwards. If rank 0 fails, the
+    other workers may be blocked in a collective, so they are terminated.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    ctx = mp.get_context("spawn")
+    workers = [
+        ctx.Process(target=run_worker, args=(fn, arg_list, rank, nproc, port))
+        for rank in range(1, nproc)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        result = run_worker(fn, arg_list, 0, nproc, port)
+    except BaseException:
+        for worker in workers:
+            worker.terminate()
+            worker.join()
+        raise
+    for worker in workers:
+        worker.join()
+    failed = [worker.exitcode for worker in workers if worker.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"Distributed workers exited with codes: {failed}")
+    return result
+
+
+def run_worker(
+    fn: Callable[..., Any],
+    arg_list: tuple[str, ...],
+    rank: int,
+    world_size: int,
+    port: int,
+) -> Any:
+    saved_env = {key: os.environ.get(key) for key in ("MASTER_ADDR", "MASTER_PORT")}
+    num_threads = torch.get_num_threads()
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    # Split the intra-op thread pool between workers instead of oversubscribing.
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    try:
+        if torch.cuda.is_available():
+            torch.cuda.set_device(rank % torch.cuda.device_count())
+        dist.init_process_group(BACKEND, rank=rank, world_size=world_size)
+        try:
+            return fn(*arg_list)
+        finally:
+            dist.destroy_process_group()
+    finally:
+        torch.set_num_threads(num_threads)
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def broadcast_optimizer_state(optimizer: optim.Optimizer) -> None:
+    """Makes every rank start from the optimizer state held by rank 0."""
+    if is_initialized():
+        for state in optimizer.state.values():
+            for val in state.values():
+                if isinstance(val, torch.Tensor):
+                    dist.broadcast(val, src=0)
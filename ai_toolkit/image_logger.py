@@ -0,0 +1,131 @@
+"""
+Validation images for TensorBoard, sampled per epoch instead of written for every
+example. An ImageReservoir keeps a uniform sample of up to `quota` examples of each
+target class, and an ImageWriter encodes and writes them on a background thread.
+"""
+from __future__ import annotations
+
+import queue
+import random
+import threading
+from typing import TYPE_CHECKING, Tuple
+
+import torch
+
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
+
+# (image, target class, predicted class)
+Sample = Tuple[torch.Tensor, int, int]
+
+
+class ImageReservoir:
+    """
+    Reservoir sampling per target class. The decision for each example only needs
+    its target, so just the selected images and predictions are copied to the CPU.
+    The sample is drawn with its own seeded RNG, leaving the global RNG untouched.
+    """
+
+    def __init__(self, quota: int, seed: int = 0) -> None:
+        self.quota = quota
+        self.reset(seed)
+
+    def reset(self, seed: int = 0) -> None:
+        self.rng = random.Random(seed)
+        self.seen: dict[int, int] = {}
+        self.samples: dict[int, list[Sample]] = {}
+
+    def add(self, data: torch.Tensor, pred: torch.Tensor, target: torch.Tensor) -> None:
+        if self.quota <= 0:
+            return
+        choices = []  # (target class, slot in its reservoir, row of the batch)
+        sizes = {c: len(samples) for c, samples in self.samples.items()}
+        for row, c in enumerate(target.tolist()):
+            self.seen[c] = self.seen.get(c, 0) + 1
+            size = sizes.get(c, 0)
+            if size < self.quota:
+                sizes[c] = size + 1
+                choices.append((c, size, row))
+            else:
+                slot = self.rng.randrange(self.seen[c])
+                if slot < self.quota:
+                    choices.append((c, slot, row))
+        if not choices:
+            return
+
+        rows = torch.tensor([row for _, _, row in choices], device=data.device)
+        images = data.detach()[rows].cpu()
+        preds = pred[rows].tolist()
+        for (c, slot, _), image, p in zip(choices, images, preds):
+            samples = self.samples.setdefault(c, [])
+            if slot == len(samples):
+                samples.append((image, c, p))
+            else:
+                samples[slot] = (image, c, p)
+
+    def get_samples(self, limit: int | None = None) -> list[Sample]:
+        """
+        Samples ordered by class. If there are more than limit, e.g. because there
+        are more classes than images in the budget, a random subset is returned.
+        """
+        samples = [sample for c in sorted(self.samples) for sample in self.samples[c]]
+        if limit is not None and len(samples) > limit:
+            keep = sorted(self.rng.sample(range(len(samples)), limit))
+            samples = [samples[i] for i in keep]
+        return samples
+
+
+class ImageWriter:
+    """
+    Adds images to TensorBoard on a background thread, where add_image does the
+    PNG encoding. Like util.CheckpointWriter, at most one batch is in flight.
+    """
+
+    def __init__(self, writer: SummaryWriter, class_labels: list[str]) -> None:
+        self.writer = writer
+        self.class_labels = class_labels
+        self.queue: queue.Queue[tuple[list[Sample], int] | None] = queue.Queue(
+            maxsize=1
+        )
+        self.error: BaseException | None = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            samples, step = item
+            try:
+                for image, target_ind, pred_ind in samples:
+                    target_class = self.class_labels[target_ind]
+                    pred_class = self.class_labels[pred_ind]
+                    self.writer.add_image(
+                        f"{target_class}/Predicted_{pred_class}", image, step
+                    )
+            except BaseException as e:  # pylint: disable=broad-except
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def write(self, samples: list[Sample], step: int) -> None:
+        self.flush()
+        self.queue.put((samples, step))
+
+    def flush(self) -> None:
+        """Blocks until pending images are written, re-raising any error they hit."""
+        self.queue.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("Failed to write images.") from error
+
+    def close(self) -> None:
+        """Flushes pending images, then stops the writer thread."""
+        try:
+            self.flush()
+        finally:
+            if self.thread.is_alive():
+                self.queue.put(None)
+                self.thread.join()
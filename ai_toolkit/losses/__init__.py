@@ -1,24 +1,34 @@
 """ Imports all Loss functions. """
-import sys
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
+from ai_toolkit.registry import Registry
 
-from .dice import DiceLoss
-from .focal import FocalLoss
+if TYPE_CHECKING:
+    from .dice import DiceLoss
+    from .focal import FocalLoss
+
+LOSSES = Registry(
+    __name__,
+    "ai_toolkit.losses",
+    {
+        "nn.CrossEntropyLoss": "torch.nn:CrossEntropyLoss",
+        "F.nll_loss": "torch.nn:NLLLoss",
+        "nn.NLLLoss": "torch.nn:NLLLoss",
+        "DiceLoss": ".dice:DiceLoss",
+        "FocalLoss": ".focal:FocalLoss",
+    },
+)
 
 
 def get_loss_initializer(loss_fn: str) -> Any:
     """Retrieves class initializer from its string name."""
-    if loss_fn == "nn.CrossEntropyLoss":
-        return nn.CrossEntropyLoss
-    if loss_fn in ("F.nll_loss", "nn.NLLLoss"):
-        return nn.NLLLoss
-    if not hasattr(sys.modules[__name__], loss_fn):
+    if loss_fn not in LOSSES:
         raise RuntimeError(f"Metric {loss_fn} not found in metrics folder.")
-    return getattr(sys.modules[__name__], loss_fn)
+    return LOSSES.get(loss_fn)
+
+
+def __getattr__(name: str) -> Any:
+    return LOSSES.module_getattr(__name__, name)
 
 
 __all__ = ("DiceLoss", "FocalLoss", "get_loss_initializer")
@@ -4,14 +4,23 @@ import json
 from enum import Enum, unique
 from pathlib import Path
 from types import SimpleNamespace
-from typing import Any, Iterator
+from typing import Any, Iterator, Mapping
 
 import torch
 import torch.nn as nn
-from torch.utils.tensorboard import SummaryWriter
 
+from ai_toolkit import distributed
 from ai_toolkit.args import Arguments, get_run_name
-from ai_toolkit.metrics import Metric, get_metric_initializer
+from ai_toolkit.image_logger import ImageReservoir, ImageWriter
+from ai_toolkit.metrics import (
+    DERIVED_VALUES,
+    DerivedValues,
+    Metric,
+    get_metric_initializer,
+)
+from ai_toolkit.metrics.derived import get_derived
+from ai_toolkit.metrics_log import MetricsLogWriter
+from ai_toolkit.step_timer import StepTimer
 
 
 @unique
@@ -23,22 +32,41 @@ class MetricTracker:
     def __init__(
         self,
         args: Arguments,
-        checkpoint: dict[str, Any],
+        checkpoint: Mapping[str, Any],
         class_labels: list[str] | None = None,
     ) -> None:
         if not args.metrics:
             raise RuntimeError("No metrics specified in args.")
         self.run_name = ""
         self.writer = None
-        if not args.no_save:
+        self.metrics_log = None
+        if not args.no_save and distributed.is_main_process():
             run_name = checkpoint.get("run_name", get_run_name(args))
             self.run_name = str(run_name)
-            self.writer = SummaryWriter(self.run_name)
+            if "tensorboard" in args.scalar_logs:
+                # pylint: disable-next=import-outside-toplevel
+                from torch.utils.tensorboard import SummaryWriter
+
+                self.writer = SummaryWriter(self.run_name)
+            if "columnar" in args.scalar_logs:
+                self.metrics_log = MetricsLogWriter(run_name)
             print(f"Storing checkpoints in: {self.run_name}\n")
             with open(Path(run_name) / "args.json", "w") as f:
                 json.dump(args.to_json(), f, indent=4)
 
         self.class_labels = [] if class_labels is None else class_labels
+        # Validation images are sampled with an equal quota per class, which is at
+        # least one image unless image_budget is 0. With more classes than the
+        # budget, a random subset of the classes is written each epoch.
+        num_classes = max(1, len(self.class_labels))
+        self.image_reservoir = ImageReservoir(
+            max(args.image_budget // num_classes, min(args.image_budget, 1))
+        )
+        self.image_writer = (
+            None
+            if self.writer is None or not self.class_labels or args.no_visualize
+            else ImageWriter(self.writer, self.class_labels)
+        )
 
         metric_checkpoint = checkpoint.get("metric_obj", {})
         self.epoch = metric_checkpoint.get("epoch", 0)
@@ -47,10 +75,19 @@ class MetricTracker:
             "metric_data",
             {name: get_metric_initializer(name)() for name in args.metrics},
         )
+        for metric in self.metric_data.values():
+            for name in metric.DERIVED:
+                if name not in DERIVED_VALUES:
+                    raise RuntimeError(f"{metric.name} uses unknown derived {name}.")
         self.primary_metric = metric_checkpoint.get("primary_metric", args.metrics[0])
+        # Batches seen in each mode over all epochs, for loaders without a length.
+        self.step_counts: dict[str, int] = metric_checkpoint.get("step_counts", {})
+        self.epoch_batches = 0
         self.end_epoch = self.epoch + args.epochs
         self.args = args
         self.prev_best: float | None = None
+        self.loss_finite: torch.Tensor | None = None
+        self.timer = StepTimer(args.timing)
 
     def __getitem__(self, name: str) -> Metric:
         return self.metric_data[name]
@@ -71,23 +108,53 @@ class MetricTracker:
 
     def next_epoch(self) -> None:
         self.epoch += 1
-        print(f"Epoch [{self.epoch}/{self.end_epoch}]")
+        if distributed.is_main_process():
+            print(f"Epoch [{self.epoch}/{self.end_epoch}]")
 
     def reset_hard(self) -> None:
+        self.loss_finite = None
+        self.epoch_batches = 0
+        self.image_reservoir.reset(self.epoch)
+        self.timer.reset()
         for metric in self.metric_data.values():
             metric.epoch_reset()
 
+    def check_loss_finite(self) -> None:
+        if self.loss_finite is not None and not self.loss_finite:
+            raise RuntimeError("Loss in training is NaN or inf.")
+
     def batch_update(
-        self, val_dict: SimpleNamespace, i: int, num_batches: int, mode: Mode
+        self, val_dict: SimpleNamespace, i: int, num_batches: int | None, mode: Mode
     ) -> dict[str, float]:
-        if not torch.isfinite(val_dict.loss).all():
-            raise RuntimeError("Loss in training is NaN or inf.")
-        tqdm_dict = {}
-        for metric_name, metric in self.metric_data.items():
+        """
+        Metrics accumulate on the device; Python floats (and the returned tqdm
+        postfix) are only produced every log_interval batches and on the last batch.
+        num_batches is None when the loader streams an unknown number of batches.
+        """
+        self.epoch_batches = i + 1
+        loss_finite = torch.isfinite(val_dict.loss.detach()).all()
+        self.loss_finite = (
+            loss_finite if self.loss_finite is None else self.loss_finite & loss_finite
+        )
+        # Intermediate values such as the argmax are computed once for all metrics.
+        val_dict.derived = DerivedValues(val_dict)
+        for metric in self.metric_data.values():
             metric.update(val_dict)
-            tqdm_dict[metric_name] = metric.value
 
-        num_steps = (self.epoch - 1) * num_batches + i
+        tqdm_dict = {}
+        if i % self.args.log_interval == 0 or (
+            num_batches is not None and i == num_batches - 1
+        ):
+            self.check_loss_finite()
+            for metric_name, metric in self.metric_data.items():
+                metric.materialize()
+                tqdm_dict[metric_name] = metric.value
+
+        num_steps = (
+            self.step_counts.get(str(mode), 0) + i
+            if num_batches is None
+            else (self.epoch - 1) * num_batches + i
+        )
         # Only reset batch statistics after log_interval batches
         if i > 0 and i % self.args.log_interval == 0:
             if mode == Mode.TRAIN:
@@ -103,22 +170,46 @@ class MetricTracker:
             for metric in self.metric_data.values():
                 metric.batch_reset()
 
-        if mode == Mode.VAL and not self.args.no_visualize:
+        if mode == Mode.VAL and self.image_writer is not None:
             # (N, C, H, W)
             if hasattr(val_dict.data, "size") and len(val_dict.data.size()) == 4:
-                self.add_images(val_dict, num_steps)
+                self.add_images(val_dict)
         return tqdm_dict
 
     def epoch_update(self, mode: Mode) -> None:
+        self.check_loss_finite()
+        self.step_counts[str(mode)] = (
+            self.step_counts.get(str(mode), 0) + self.epoch_batches
+        )
         result_str = f"{mode} "
         for metric_name, metric in self.metric_data.items():
+            metric.materialize()
+            if distributed.is_initialized():
+                metric.all_reduce()
             self.write(f"{mode}_Epoch_{metric_name}", metric.value, self.epoch)
+            if self.writer is not None and not self.args.no_visualize:
+                metric.write_figures(
+                    self.writer,
+                    f"{mode}_Epoch_{metric_name}",
+                    self.epoch,
+                    self.run_name,
+                    self.class_labels,
+                )
             if mode == Mode.VAL and metric_name == self.primary_metric:
                 self.is_best = self.prev_best is None or metric.value < self.prev_best
                 if self.is_best:
                     self.prev_best = metric.value
             result_str += f"{metric} "
-        print(result_str)
+        if mode == Mode.VAL and self.image_writer is not None:
+            samples = self.image_reservoir.get_samples(self.args.image_budget)
+            self.image_writer.write(samples, self.epoch)
+        for name, val in self.timer.summary().items():
+            self.write(f"{mode}_Timing_{name}", val, self.epoch)
+        result_str += f"{self.timer}"
+        if self.metrics_log is not None:
+            self.metrics_log.flush()
+        if distributed.is_main_process():
+            print(result_str)
 
     def add_network(self, model: nn.Module, loader: Iterator[Any]) -> None:
         if self.writer is not None:
@@ -128,18 +219,20 @@ class MetricTracker:
     def write(self, title: str, val: float, step_num: int) -> None:
         if self.writer is not None:
             self.writer.add_scalar(title, val, step_num)
+        if self.metrics_log is not None:
+            self.metrics_log.add_scalar(title, val, step_num)
 
-    def add_images(self, val_dict: SimpleNamespace, num_steps: int) -> None:
-        if self.writer is not None and self.class_labels:
-            data, output, target = val_dict.data, val_dict.output, val_dict.target
-            for j in range(output.shape[0]):
-                _, pred_ind = torch.max(output.detach()[j], dim=0)
-                target_ind = int(target.detach()[j])
-                pred_class = self.class_labels[int(pred_ind)]
-                target_class = self.class_labels[target_ind]
-                self.writer.add_image(
-                    f"{target_class}/Predicted_{pred_class}", data[j], num_steps
-                )
+    def add_images(self, val_dict: SimpleNamespace) -> None:
+        """Offers the batch's images to this epoch's sample, written in epoch_update."""
+        pred = get_derived(val_dict, "argmax")
+        self.image_reservoir.add(val_dict.data, pred, val_dict.target)
+
+    def flush(self) -> None:
+        """Called once training ends, which also stops the image writer thread."""
+        if self.image_writer is not None:
+            self.image_writer.close()
+        if self.metrics_log is not None:
+            self.metrics_log.flush()
 
     def json_repr(self) -> dict[str, Any]:
         return {
@@ -147,4 +240,5 @@ class MetricTracker:
             "metric_data": self.metric_data,
             "primary_metric": self.primary_metric,
             "is_best": self.is_best,
+            "step_counts": self.step_counts,
         }
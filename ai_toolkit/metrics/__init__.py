@@ -1,30 +1,65 @@
 """ Imports all Metric objects. """
 from __future__ import annotations
 
-import sys
-from typing import Type, cast
-
-from .accuracy import Accuracy
-from .dice import Dice
-from .f1_score import F1Score
-from .iou import IoU
-from .loss import Loss
+from typing import TYPE_CHECKING, Any, Type, cast
+
+from ai_toolkit.registry import Registry
+
+from .derived import DERIVED_VALUES, DerivedValues
 from .metric import Metric
+from .score_histogram import ScoreHistogram
+
+if TYPE_CHECKING:
+    from .accuracy import Accuracy
+    from .auroc import AUROC
+    from .average_precision import AveragePrecision
+    from .confusion_matrix import ConfusionMatrix
+    from .dice import Dice
+    from .f1_score import F1Score
+    from .iou import IoU
+    from .loss import Loss
+
+# Metrics that plot their results import matplotlib, so they are only imported when
+# used.
+METRICS = Registry(
+    __name__,
+    "ai_toolkit.metrics",
+    {
+        "AUROC": ".auroc:AUROC",
+        "Accuracy": ".accuracy:Accuracy",
+        "AveragePrecision": ".average_precision:AveragePrecision",
+        "ConfusionMatrix": ".confusion_matrix:ConfusionMatrix",
+        "Dice": ".dice:Dice",
+        "F1Score": ".f1_score:F1Score",
+        "IoU": ".iou:IoU",
+        "Loss": ".loss:Loss",
+    },
+)
 
 
 def get_metric_initializer(metric_name: str) -> type[Metric]:
     """Retrieves class initializer from its string name."""
-    if not hasattr(sys.modules[__name__], metric_name):
+    if metric_name not in METRICS:
         raise RuntimeError(f"Metric {metric_name} not found in metrics folder.")
-    return cast(Type[Metric], getattr(sys.modules[__name__], metric_name))
+    return cast(Type[Metric], METRICS.get(metric_name))
+
+
+def __getattr__(name: str) -> Any:
+    return METRICS.module_getattr(__name__, name)
 
 
 __all__ = (
+    "AUROC",
     "Accuracy",
+    "AveragePrecision",
+    "ConfusionMatrix",
+    "DERIVED_VALUES",
+    "DerivedValues",
     "Dice",
     "F1Score",
     "IoU",
     "Loss",
     "Metric",
+    "ScoreHistogram",
     "get_metric_initializer",
 )
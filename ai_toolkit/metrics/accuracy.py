@@ -6,16 +6,18 @@ from .metric import Metric
 
 
 class Accuracy(Metric):
+    DERIVED = ("argmax",)
+
     def __repr__(self) -> str:
         return f"{self.name}: {100. * self.value:.2f}%"
 
     @staticmethod
-    def calculate_accuracy(output: torch.Tensor, target: torch.Tensor) -> float:
-        return (output.argmax(1) == target).float().sum().item()
+    def count_correct(pred: torch.Tensor, target: torch.Tensor) -> torch.Tensor:
+        return (pred == target).sum().double()
 
-    def update(self, val_dict: SimpleNamespace) -> float:
-        output, target = val_dict.output, val_dict.target
-        accuracy = self.calculate_accuracy(output, target)
+    def update(self, val_dict: SimpleNamespace) -> torch.Tensor:
+        pred, target = self.derived(val_dict, "argmax"), val_dict.target
+        accuracy = self.count_correct(pred, target)
         self.epoch_avg += accuracy
         self.running_avg += accuracy
         self.num_examples += val_dict.batch_size
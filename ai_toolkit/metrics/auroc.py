@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import torch
+
+from .score_histogram import ScoreHistogram
+
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
+
+
+@dataclass(repr=False)
+class AUROC(ScoreHistogram):
+    """Area under the one-vs-rest ROC curve of each class, by the trapezoidal rule."""
+
+    @staticmethod
+    def calculate_roc_curves(histograms: torch.Tensor) -> tuple[torch.Tensor, ...]:
+        """Returns the false and true positive rates of each class."""
+        tp, fp = ScoreHistogram.cumulative_counts(histograms)
+        tpr = tp / tp[:, -1:].clamp(min=1)
+        fpr = fp / fp[:, -1:].clamp(min=1)
+        return fpr, tpr
+
+    def calculate_per_class(
+        self, histograms: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        fpr, tpr = self.calculate_roc_curves(histograms)
+        areas = ((fpr[:, 1:] - fpr[:, :-1]) * (tpr[:, 1:] + tpr[:, :-1]) / 2).sum(1)
+        # Needs both positive and negative examples.
+        defined = (histograms.sum(-1) > 0).all(0)
+        return areas, defined
+
+    def write_figures(
+        self,
+        writer: SummaryWriter,
+        tag: str,
+        step: int,
+        run_name: str,
+        class_labels: list[str],
+    ) -> None:
+        if self.histograms is not None:
+            # matplotlib is only imported when plotting.
+            # pylint: disable-next=import-outside-toplevel
+            from ai_toolkit.visualizations import plot_roc_curves
+
+            fpr, tpr = self.calculate_roc_curves(self.histograms)
+            areas, defined = self.calculate_per_class(self.histograms)
+            plot_roc_curves(
+                fpr[defined],
+                tpr[defined],
+                areas[defined],
+                [
+                    class_labels[i] if class_labels else str(i)
+                    for i in defined.nonzero().flatten().tolist()
+                ],
+                run_name,
+                tag,
+                writer,
+                step,
+            )
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import torch
+
+from .score_histogram import ScoreHistogram
+
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
+
+
+@dataclass(repr=False)
+class AveragePrecision(ScoreHistogram):
+    """
+    Area under the one-vs-rest precision-recall curve of each class, as the sum of
+    the precision at each threshold weighted by the increase in recall.
+    """
+
+    def calculate_per_class(
+        self, histograms: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        tp, fp = self.cumulative_counts(histograms)
+        recall = tp / tp[:, -1:].clamp(min=1)
+        precision = tp[:, 1:] / (tp[:, 1:] + fp[:, 1:]).clamp(min=1)
+        average_precision = ((recall[:, 1:] - recall[:, :-1]) * precision).sum(1)
+        # Needs positive examples.
+        defined = histograms[0].sum(-1) > 0
+        return average_precision, defined
+
+    def write_figures(
+        self,
+        writer: SummaryWriter,
+        tag: str,
+        step: int,
+        run_name: str,
+        class_labels: list[str],
+    ) -> None:
+        if self.histograms is None:
+            return
+        # TensorBoard's PR curves go from the lowest threshold to the highest.
+        tp, fp = self.cumulative_counts(self.histograms)
+        tp, fp = tp[:, 1:].flip(-1), fp[:, 1:].flip(-1)
+        fn, tn = tp[:, :1] - tp, fp[:, :1] - fp
+        precision = tp / (tp + fp).clamp(min=1)
+        recall = tp / tp[:, :1].clamp(min=1)
+        for i in range(tp.shape[0]):
+            label = class_labels[i] if class_labels else str(i)
+            writer.add_pr_curve_raw(
+                f"{tag}/{label}",
+                tp[i].cpu(),
+                fp[i].cpu(),
+                tn[i].cpu(),
+                fn[i].cpu(),
+                precision[i].cpu(),
+                recall[i].cpu(),
+                step,
+                num_thresholds=self.num_bins,
+            )
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+import torch
+
+from .metric import Metric
+
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
+
+
+class ConfusionMatrix(Metric):
+    """
+    Counts (target, prediction) pairs in a C x C matrix, where C is the number of
+    output channels, with one bincount per batch, so memory does not grow with the
+    dataset. Segmentation outputs are counted per element. Its value is the
+    accuracy; per-class precision, recall and F1 are derived from the matrix.
+    """
+
+    DERIVED = ("argmax",)
+
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        self.matrix: torch.Tensor | None = None
+
+    def update(self, val_dict: SimpleNamespace) -> torch.Tensor:
+        pred, target = self.derived(val_dict, "argmax"), val_dict.target
+        num_classes = val_dict.output.shape[1]
+        counts = torch.bincount(
+            target.flatten() * num_classes + pred.flatten(), minlength=num_classes**2
+        ).reshape(num_classes, num_classes)
+        if self.matrix is None:
+            self.matrix = counts
+        else:
+            self.matrix += counts
+        # Counted per example, like the other metrics, when there are many elements.
+        correct: torch.Tensor = (
+            counts.trace().double() * val_dict.batch_size / target.numel()
+        )
+        self.epoch_avg += correct
+        self.running_avg += correct
+        self.num_examples += val_dict.batch_size
+        return correct
+
+    def all_reduce(self) -> None:
+        super().all_reduce()
+        self.matrix = self.all_reduce_counts(self.matrix, ndim=2)
+
+    def epoch_reset(self) -> None:
+        super().epoch_reset()
+        self.matrix = None
+
+    def precision(self) -> torch.Tensor:
+        """Per-class precision; 0 for classes that were never predicted."""
+        return self.safe_divide(self.true_positives(), self.get_matrix().sum(0))
+
+    def recall(self) -> torch.Tensor:
+        """Per-class recall; 0 for classes that never occur in the targets."""
+        return self.safe_divide(self.true_positives(), self.get_matrix().sum(1))
+
+    def f1_score(self) -> torch.Tensor:
+        precision, recall = self.precision(), self.recall()
+        return self.safe_divide(2 * precision * recall, precision + recall)
+
+    def true_positives(self) -> torch.Tensor:
+        return self.get_matrix().diagonal().double()
+
+    def get_matrix(self) -> torch.Tensor:
+        if self.matrix is None:
+            raise RuntimeError("ConfusionMatrix has not been updated.")
+        return self.matrix
+
+    @staticmethod
+    def safe_divide(numerator: torch.Tensor, denominator: torch.Tensor) -> torch.Tensor:
+        return numerator / denominator.double().clamp(min=1e-12)
+
+    def write_figures(
+        self,
+        writer: SummaryWriter,
+        tag: str,
+        step: int,
+        run_name: str,
+        class_labels: list[str],
+    ) -> None:
+        if self.matrix is not None:
+            # matplotlib is only imported when plotting.
+            # pylint: disable-next=import-outside-toplevel
+            from ai_toolkit.visualizations import plot_confusion_matrix
+
+            plot_confusion_matrix(
+                self.matrix, class_labels, run_name, tag, writer, step
+            )
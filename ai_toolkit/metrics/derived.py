@@ -0,0 +1,40 @@
+"""
+Values derived from a batch's output and target that several metrics use, such as
+the predicted classes. Metrics list the ones they use in DERIVED, and read them
+from the batch's DerivedValues, which computes each one at most once per batch.
+"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Callable
+
+import torch
+from torch.nn import functional as F
+
+THRESHOLD = 0.5
+
+DERIVED_VALUES: dict[str, Callable[[SimpleNamespace], torch.Tensor]] = {
+    "argmax": lambda val_dict: val_dict.output.detach().argmax(1),
+    "probabilities": lambda val_dict: F.softmax(val_dict.output.detach(), dim=1),
+    "mask": lambda val_dict: val_dict.output.detach() > THRESHOLD,
+    "one_hot": lambda val_dict: F.one_hot(val_dict.target, val_dict.output.shape[1]),
+}
+
+
+class DerivedValues:
+    def __init__(self, val_dict: SimpleNamespace) -> None:
+        self.val_dict = val_dict
+        self.values: dict[str, torch.Tensor] = {}
+
+    def __getitem__(self, name: str) -> torch.Tensor:
+        if name not in self.values:
+            self.values[name] = DERIVED_VALUES[name](self.val_dict)
+        return self.values[name]
+
+
+def get_derived(val_dict: SimpleNamespace, name: str) -> torch.Tensor:
+    """Reads a derived value, creating the batch's cache if there is none yet."""
+    if not hasattr(val_dict, "derived"):
+        val_dict.derived = DerivedValues(val_dict)
+    derived: DerivedValues = val_dict.derived
+    return derived[name]
@@ -1,41 +1,96 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
 from types import SimpleNamespace
-from typing import cast
 
 import torch
-from torch.nn import functional as F
 
 from .metric import Metric
 
+AVERAGES = ("micro", "macro", "weighted")
+
 
+@dataclass(repr=False)
 class F1Score(Metric):
+    """
+    Accumulates per-class true positive, false positive and false negative counts
+    of the argmax predictions, so the F1 score is exact over the whole epoch rather
+    than an average of per-batch scores. average is one of:
+        micro: F1 of the counts summed over all classes.
+        macro: mean F1 of the classes that occur in the targets or predictions.
+        weighted: mean F1 of all classes, weighted by their number of targets.
+    """
+
+    average: str = "macro"
+
+    DERIVED = ("argmax",)
+
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        if self.average not in AVERAGES:
+            raise RuntimeError(f"average must be one of {AVERAGES}: {self.average}")
+        # Rows are the true positive, false positive and false negative counts.
+        self.counts: torch.Tensor | None = None
+        self.running_counts: torch.Tensor | None = None
+
+    @property
+    def value(self) -> float:
+        if self.counts is None:
+            return 0.0
+        return float(self.calculate_f1_score(self.counts, self.average))
+
     @staticmethod
-    def calculate_f1_score(
-        y_pred: torch.Tensor, y_true: torch.Tensor, eps: float = 1e-7
-    ) -> float:
-        if y_pred.dim() != 2 or y_true.dim() != 1:
-            raise RuntimeError(
-                f"f1_score parameters have incorrect shapes: {y_pred} {y_true}"
-            )
-        y_true = F.one_hot(y_true, 2)
-        y_pred = F.softmax(y_pred, dim=1)
-
-        tp = (y_true * y_pred).sum(dim=0)
-        # tn = ((1 - y_true) * (1 - y_pred)).sum(dim=0)
-        fp = ((1 - y_true) * y_pred).sum(dim=0)
-        fn = (y_true * (1 - y_pred)).sum(dim=0)
-
-        precision = tp / (tp + fp + eps)
-        recall = tp / (tp + fn + eps)
-
-        f1 = 2 * (precision * recall) / (precision + recall + eps)
-        f1 = f1.clamp(min=eps, max=1 - eps)
-        f1_score = 1 - f1.mean()
-        return cast(float, f1_score)
-
-    def update(self, val_dict: SimpleNamespace) -> float:
-        y_pred, y_true = val_dict.output, val_dict.target
-        f1_score = self.calculate_f1_score(y_pred, y_true)
-        self.epoch_avg += f1_score
-        self.running_avg += f1_score
+    def calculate_counts(
+        pred: torch.Tensor, target: torch.Tensor, num_classes: int
+    ) -> torch.Tensor:
+        pred, target = pred.flatten(), target.flatten()
+        true_positives = torch.bincount(target[pred == target], minlength=num_classes)
+        predicted = torch.bincount(pred, minlength=num_classes)
+        actual = torch.bincount(target, minlength=num_classes)
+        return torch.stack(
+            (true_positives, predicted - true_positives, actual - true_positives)
+        )
+
+    @staticmethod
+    def calculate_f1_score(counts: torch.Tensor, average: str) -> torch.Tensor:
+        counts = counts.double()
+        if average == "micro":
+            counts = counts.sum(1, keepdim=True)
+        tp, fp, fn = counts
+        denominator = 2 * tp + fp + fn
+        f1 = 2 * tp / denominator.clamp(min=1)
+        if average == "weighted":
+            support = tp + fn
+            result: torch.Tensor = (f1 * support).sum() / support.sum().clamp(min=1)
+        else:
+            present = denominator > 0
+            result = f1[present].sum() / present.sum().clamp(min=1)
+        return result
+
+    def update(self, val_dict: SimpleNamespace) -> torch.Tensor:
+        pred, target = self.derived(val_dict, "argmax"), val_dict.target
+        counts = self.calculate_counts(pred, target, val_dict.output.shape[1])
+        self.counts = counts if self.counts is None else self.counts + counts
+        self.running_counts = (
+            counts if self.running_counts is None else self.running_counts + counts
+        )
         self.num_examples += val_dict.batch_size
-        return f1_score
+        return counts
+
+    def all_reduce(self) -> None:
+        super().all_reduce()
+        self.counts = self.all_reduce_counts(self.counts, ndim=2)
+
+    def batch_reset(self) -> None:
+        super().batch_reset()
+        self.running_counts = None
+
+    def epoch_reset(self) -> None:
+        super().epoch_reset()
+        self.counts = None
+        self.running_counts = None
+
+    def get_batch_result(self, batch_size: int, log_interval: int = 1) -> float:
+        if self.running_counts is None:
+            return 0.0
+        return float(self.calculate_f1_score(self.running_counts, self.average))
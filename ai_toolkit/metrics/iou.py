@@ -6,20 +6,21 @@ from .metric import Metric
 
 
 class IoU(Metric):
+    DERIVED = ("mask",)
+
     @staticmethod
     def calculate_iou(
-        output: torch.Tensor, target: torch.Tensor, eps: float = 1e-7
-    ) -> float:
-        output = output > 0.5
-        output, target = output.squeeze(), target.squeeze().bool()
+        mask: torch.Tensor, target: torch.Tensor, eps: float = 1e-7
+    ) -> torch.Tensor:
+        output, target = mask.squeeze(), target.squeeze().bool()
         intersection = (output & target).float().sum((1, 2)) + eps
         union = (output | target).float().sum((1, 2)) + eps
-        accuracy = (intersection / union).sum().item()
+        accuracy = (intersection / union).sum()
         return accuracy
 
-    def update(self, val_dict: SimpleNamespace) -> float:
-        output, target = val_dict.output, val_dict.target
-        accuracy = self.calculate_iou(output, target)
+    def update(self, val_dict: SimpleNamespace) -> torch.Tensor:
+        mask, target = self.derived(val_dict, "mask"), val_dict.target
+        accuracy = self.calculate_iou(mask, target).double()
         self.epoch_avg += accuracy
         self.running_avg += accuracy
         self.num_examples += val_dict.batch_size
@@ -1,13 +1,14 @@
 from types import SimpleNamespace
-from typing import cast
+
+import torch
 
 from .metric import Metric
 
 
 class Loss(Metric):
-    def update(self, val_dict: SimpleNamespace) -> float:
-        loss = val_dict.loss.item()
+    def update(self, val_dict: SimpleNamespace) -> torch.Tensor:
+        loss: torch.Tensor = val_dict.loss.detach().double()
         self.epoch_avg += loss * val_dict.batch_size
         self.running_avg += loss * val_dict.batch_size
         self.num_examples += val_dict.batch_size
-        return cast(float, loss)
+        return loss
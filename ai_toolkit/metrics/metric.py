@@ -1,11 +1,33 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
 from types import SimpleNamespace
+from typing import TYPE_CHECKING, ClassVar
+
+import torch
+import torch.distributed as dist
+
+from .derived import get_derived
+
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
 
 
 @dataclass
 class Metric:
-    epoch_avg: float = 0
-    running_avg: float = 0
+    """
+    Accumulators may hold device-resident tensors between log intervals, so that
+    update() never forces a host sync. Call materialize() to convert them back
+    into Python floats.
+
+    DERIVED names the values from derived.DERIVED_VALUES that update() reads with
+    self.derived(), which are shared with the other metrics of the batch.
+    """
+
+    DERIVED: ClassVar[tuple[str, ...]] = ()
+
+    epoch_avg: float | torch.Tensor = 0
+    running_avg: float | torch.Tensor = 0
     num_examples: int = 0
 
     def __post_init__(self) -> None:
@@ -16,13 +38,58 @@ class Metric:
 
     @property
     def value(self) -> float:
+        epoch_avg = float(self.epoch_avg)
         if self.num_examples == 0:
-            return self.epoch_avg
-        return self.epoch_avg / self.num_examples
+            return epoch_avg
+        return epoch_avg / self.num_examples
 
-    def update(self, val_dict: SimpleNamespace) -> float:
+    def update(self, val_dict: SimpleNamespace) -> torch.Tensor:
         raise NotImplementedError
 
+    def derived(self, val_dict: SimpleNamespace, name: str) -> torch.Tensor:
+        if name not in self.DERIVED:
+            raise RuntimeError(f"{self.name} does not list {name} in DERIVED.")
+        return get_derived(val_dict, name)
+
+    def materialize(self) -> None:
+        self.epoch_avg = float(self.epoch_avg)
+        self.running_avg = float(self.running_avg)
+
+    def all_reduce(self) -> None:
+        """Sums the epoch accumulators over all distributed ranks."""
+        totals = torch.tensor(
+            [float(self.epoch_avg), self.num_examples], dtype=torch.float64
+        )
+        dist.all_reduce(totals)
+        self.epoch_avg = totals[0].item()
+        self.num_examples = int(totals[1].item())
+
+    @staticmethod
+    def all_reduce_counts(counts: torch.Tensor | None, ndim: int) -> torch.Tensor:
+        """
+        Sums an integer tensor over all ranks. Tensors sized by the number of classes
+        are created on the first update, so a rank without batches passes None.
+        """
+        shape = torch.tensor([0] * ndim if counts is None else counts.shape)
+        dist.all_reduce(shape, op=dist.ReduceOp.MAX)
+        result = (
+            torch.zeros(shape.tolist(), dtype=torch.int64)
+            if counts is None
+            else counts.cpu()
+        )
+        dist.all_reduce(result)
+        return result
+
+    def write_figures(
+        self,
+        writer: SummaryWriter,
+        tag: str,
+        step: int,
+        run_name: str,
+        class_labels: list[str],
+    ) -> None:
+        """Called at the end of an epoch, for metrics that plot their results."""
+
     def batch_reset(self) -> None:
         self.running_avg = 0
 
@@ -34,4 +101,4 @@ class Metric:
     def get_batch_result(self, batch_size: int, log_interval: int = 1) -> float:
         if log_interval <= 0 or batch_size <= 0:
             raise RuntimeError("log_interval and batch_size must be positive.")
-        return self.running_avg / (log_interval * batch_size)
+        return float(self.running_avg) / (log_interval * batch_size)
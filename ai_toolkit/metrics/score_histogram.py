@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+import torch
+
+from .metric import Metric
+
+
+@dataclass(repr=False)
+class ScoreHistogram(Metric):
+    """
+    Base class for ranking metrics computed one-vs-rest from the softmax scores of
+    each class. Instead of keeping every score, it counts them in num_bins equal
+    bins over [0, 1], separately for positive and negative examples, so memory is
+    O(num_bins * classes) for any number of examples. Curves use the bin edges as
+    thresholds, and scores that share a bin count as ties. value is the mean of
+    the per-class scores over the classes where they are defined.
+    """
+
+    num_bins: int = 1000
+
+    DERIVED = ("probabilities", "one_hot")
+
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        # Shape (2, classes, num_bins): counts of positive, then negative scores.
+        self.histograms: torch.Tensor | None = None
+        self.running_histograms: torch.Tensor | None = None
+
+    @property
+    def value(self) -> float:
+        return self.calculate_mean(self.histograms)
+
+    def calculate_mean(self, histograms: torch.Tensor | None) -> float:
+        if histograms is None:
+            return 0.0
+        scores, defined = self.calculate_per_class(histograms)
+        return float(scores[defined].mean()) if defined.any() else 0.0
+
+    def calculate_per_class(
+        self, histograms: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Returns the score of each class, and whether it is defined."""
+        raise NotImplementedError
+
+    @staticmethod
+    def cumulative_counts(histograms: torch.Tensor) -> tuple[torch.Tensor, ...]:
+        """
+        Returns the true and false positive counts of each class at each threshold,
+        from the highest threshold to the lowest, with a leading zero column.
+        """
+        counts = histograms.double().flip(-1).cumsum(-1)
+        counts = torch.nn.functional.pad(counts, (1, 0))
+        return counts[0], counts[1]
+
+    def update(self, val_dict: SimpleNamespace) -> torch.Tensor:
+        probabilities = self.derived(val_dict, "probabilities")
+        num_classes = probabilities.shape[1]
+        scores = probabilities.movedim(1, -1).reshape(-1, num_classes)
+        is_negative = self.derived(val_dict, "one_hot").reshape(-1, num_classes) == 0
+        bins = (scores * self.num_bins).long().clamp(max=self.num_bins - 1)
+        # One bincount over (positive or negative, class, bin) for the whole batch.
+        classes = torch.arange(num_classes, device=bins.device)
+        index = (is_negative.long() * num_classes + classes) * self.num_bins + bins
+        histograms = torch.bincount(
+            index.flatten(), minlength=2 * num_classes * self.num_bins
+        ).reshape(2, num_classes, self.num_bins)
+        self.histograms = (
+            histograms if self.histograms is None else self.histograms + histograms
+        )
+        self.running_histograms = (
+            histograms
+            if self.running_histograms is None
+            else self.running_histograms + histograms
+        )
+        self.num_examples += val_dict.batch_size
+        return histograms
+
+    def all_reduce(self) -> None:
+        super().all_reduce()
+        self.histograms = self.all_reduce_counts(self.histograms, ndim=3)
+
+    def batch_reset(self) -> None:
+        super().batch_reset()
+        self.running_histograms = None
+
+    def epoch_reset(self) -> None:
+        super().epoch_reset()
+        self.histograms = None
+        self.running_histograms = None
+
+    def get_batch_result(self, batch_size: int, log_interval: int = 1) -> float:
+        return self.calculate_mean(self.running_histograms)
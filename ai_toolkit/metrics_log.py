@@ -0,0 +1,103 @@
+"""
+Compact alternative to TensorBoard event files for scalars. Each run directory gets
+metrics.bin, an append-only array of fixed-width (step, tag id, value) records that
+can be memory-mapped with RECORD_DTYPE, and metrics_tags.json, the list of tags
+indexed by tag id.
+"""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([("step", "<i8"), ("tag", "<u4"), ("value", "<f8")])
+RECORDS_FILE = "metrics.bin"
+TAGS_FILE = "metrics_tags.json"
+
+
+class MetricsLogWriter:
+    """
+    Buffers records in memory until flush(), e.g. once per epoch. When resuming a
+    run, a record cut short by a crash is truncated away, so that new records are
+    appended at a record boundary.
+    """
+
+    def __init__(self, run_dir: Path) -> None:
+        self.run_dir = Path(run_dir)
+        records_path = self.run_dir / RECORDS_FILE
+        if records_path.is_file():
+            size = records_path.stat().st_size
+            if size % RECORD_DTYPE.itemsize:
+                os.truncate(records_path, size - size % RECORD_DTYPE.itemsize)
+        self.tags = load_tags(self.run_dir)
+        self.tag_ids = {tag: i for i, tag in enumerate(self.tags)}
+        self.num_saved_tags = len(self.tags)
+        self.buffer: list[tuple[int, int, float]] = []
+
+    def add_scalar(self, tag: str, value: float, step: int) -> None:
+        if tag not in self.tag_ids:
+            self.tag_ids[tag] = len(self.tags)
+            self.tags.append(tag)
+        self.buffer.append((step, self.tag_ids[tag], value))
+
+    def flush(self) -> None:
+        # Tags are saved first, so every record on disk has a known tag.
+        if len(self.tags) > self.num_saved_tags:
+            tmp_path = self.run_dir / f"{TAGS_FILE}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.tags, f)
+            os.replace(tmp_path, self.run_dir / TAGS_FILE)
+            self.num_saved_tags = len(self.tags)
+        if self.buffer:
+            with open(self.run_dir / RECORDS_FILE, "ab") as f:
+                np.array(self.buffer, dtype=RECORD_DTYPE).tofile(f)
+            self.buffer = []
+
+
+def load_tags(run_dir: Path) -> list[str]:
+    tags_path = Path(run_dir) / TAGS_FILE
+    if not tags_path.is_file():
+        return []
+    with open(tags_path) as f:
+        tags: list[str] = json.load(f)
+    return tags
+
+
+def load_records(run_dir: Path) -> np.ndarray:
+    """
+    Memory-maps the records of a run. A record cut short by a crash during a write
+    is ignored, and removed once a MetricsLogWriter reopens the run.
+    """
+    records_path = Path(run_dir) / RECORDS_FILE
+    num_records = (
+        records_path.stat().st_size // RECORD_DTYPE.itemsize
+        if records_path.is_file()
+        else 0
+    )
+    if num_records == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(records_path, dtype=RECORD_DTYPE, mode="r", shape=(num_records,))
+
+
+def load_series(run_dir: Path, tag: str) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the steps and values logged for tag, in the order they were written."""
+    tags = load_tags(run_dir)
+    if tag not in tags:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    records = load_records(run_dir)
+    selected = records[records["tag"] == tags.index(tag)]
+    return np.array(selected["step"]), np.array(selected["value"])
+
+
+def load_runs(
+    run_dirs: Iterable[Path], tag: str
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """Loads the series for tag from every run that has a metrics log."""
+    return {
+        str(run_dir): load_series(run_dir, tag)
+        for run_dir in run_dirs
+        if (Path(run_dir) / RECORDS_FILE).is_file()
+    }
@@ -1,25 +1,44 @@
 from __future__ import annotations
 
-import sys
-from typing import Type, cast
+from typing import TYPE_CHECKING, Any, Type, cast
 
 import torch.nn as nn
 
-from .cnn import BasicCNN
-from .dense import DenseNet
-from .lstm import BasicLSTM
-from .maskrcnn import MaskRCNN
-from .rnn import BasicRNN
+from ai_toolkit.registry import Registry
+
+if TYPE_CHECKING:
+    from .cnn import BasicCNN
+    from .dense import DenseNet
+    from .lstm import BasicLSTM
+    from .maskrcnn import MaskRCNN
+    from .rnn import BasicRNN
 
 # from .unet import UNet
 # from .efficient_net import EfficientNet
 
+# MaskRCNN imports torchvision, so models are only imported when used.
+MODELS = Registry(
+    __name__,
+    "ai_toolkit.models",
+    {
+        "BasicCNN": ".cnn:BasicCNN",
+        "DenseNet": ".dense:DenseNet",
+        "BasicLSTM": ".lstm:BasicLSTM",
+        "MaskRCNN": ".maskrcnn:MaskRCNN",
+        "BasicRNN": ".rnn:BasicRNN",
+    },
+)
+
 
 def get_model_initializer(model_name: str) -> type[nn.Module]:
     """Retrieves class initializer from its string name."""
-    if not hasattr(sys.modules[__name__], model_name):
+    if model_name not in MODELS:
         raise RuntimeError(f"Model class {model_name} not found in models/")
-    return cast(Type[nn.Module], getattr(sys.modules[__name__], model_name))
+    return cast(Type[nn.Module], MODELS.get(model_name))
+
+
+def __getattr__(name: str) -> Any:
+    return MODELS.module_getattr(__name__, name)
 
 
 __all__ = (
@@ -11,6 +11,6 @@ class BasicRNN(nn.Module):
 
     def forward(self, x):
         x, _ = self.rnn(x)
-        x = x.squeeze()
+        x = x.squeeze(1)
         x = self.i2o(x)
         return x
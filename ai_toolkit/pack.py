@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from ai_toolkit.args import init_pipeline
+from ai_toolkit.datasets import get_dataset_initializer
+from ai_toolkit.datasets.sharded_dataset import write_shards
+
+SHARD_SIZE = 4096
+
+
+def pack(*arg_list: str) -> None:
+    """
+    Writes the train and test datasets of --dataset to --shard-dir as shards of
+    transformed samples, which train and test then read when given the same
+    --shard-dir. Random augmentations are therefore applied once, when packing.
+    """
+    args, _, _ = init_pipeline(*arg_list)
+    if not args.shard_dir:
+        raise RuntimeError("Set --shard-dir to the directory to write shards to.")
+
+    dataset_loader = get_dataset_initializer(args.dataset)
+    for split, train in (("train", True), ("test", False)):
+        dataset = dataset_loader.load_dataset(train)
+        metadata = (
+            {"model_params": dataset.model_params}
+            if hasattr(dataset, "model_params")
+            else {}
+        )
+        write_shards(
+            dataset,
+            args.shard_dir / split,
+            SHARD_SIZE,
+            args.num_workers,
+            dataset_loader.get_lengths(dataset),
+            metadata,
+        )
+        print(f"Packed {len(dataset)} {split} examples into {args.shard_dir / split}")
@@ -0,0 +1,101 @@
+"""
+Per-example outputs written to .npy files while a test set is evaluated, so they
+can be analysed offline, e.g. with np.load(path, mmap_mode="r"), without running
+inference again. Rows are appended as batches arrive, and the number of rows is
+only written into the header once the file is closed.
+"""
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+import numpy as np
+import torch
+
+from ai_toolkit import distributed
+
+MAGIC = b"\x93NUMPY\x01\x00"
+# Large enough for any shape, and a multiple of 64 as the .npy format requires.
+HEADER_SIZE = 256
+
+
+class NpyWriter:
+    """Appends rows of equal shape and dtype to a .npy file of unknown length."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.file: Any = None
+        self.dtype: np.dtype[Any] | None = None
+        self.row_shape: tuple[int, ...] = ()
+        self.num_rows = 0
+
+    def header(self) -> bytes:
+        assert self.dtype is not None
+        header = repr(
+            {
+                "descr": np.lib.format.dtype_to_descr(self.dtype),
+                "fortran_order": False,
+                "shape": (self.num_rows, *self.row_shape),
+            }
+        ).encode("latin1")
+        header_len = HEADER_SIZE - len(MAGIC) - 2
+        return (
+            MAGIC + struct.pack("<H", header_len) + header.ljust(header_len - 1) + b"\n"
+        )
+
+    def write(self, rows: torch.Tensor) -> None:
+        array = np.ascontiguousarray(rows.detach().cpu().numpy())
+        if self.file is None:
+            self.dtype, self.row_shape = array.dtype, array.shape[1:]
+            self.file = open(self.path, "wb")  # pylint: disable=consider-using-with
+            self.file.write(self.header())
+        elif array.dtype != self.dtype or array.shape[1:] != self.row_shape:
+            raise RuntimeError(
+                f"Rows of shape {array.shape[1:]} and dtype {array.dtype} do not match "
+                f"{self.path}, which has {self.row_shape} and {self.dtype}."
+            )
+        self.file.write(array.tobytes())
+        self.num_rows += array.shape[0]
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.seek(0)
+            self.file.write(self.header())
+            self.file.close()
+            self.file = None
+
+
+class PredictionWriter:
+    """
+    Writes model outputs to predictions.npy and targets to targets.npy in out_dir.
+    Under torch.distributed, each rank writes its own files, suffixed with _rank<r>;
+    row j of rank r is then example r + j * world_size of the test set.
+    """
+
+    def __init__(self, out_dir: Path) -> None:
+        suffix = (
+            f"_rank{distributed.get_rank()}" if distributed.is_initialized() else ""
+        )
+        self.predictions = NpyWriter(out_dir / f"predictions{suffix}.npy")
+        self.targets = NpyWriter(out_dir / f"targets{suffix}.npy")
+
+    def __enter__(self) -> PredictionWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.predictions.close()
+        self.targets.close()
+
+    def write(self, output: Any, target: Any) -> None:
+        if not isinstance(output, torch.Tensor):
+            raise RuntimeError("Only tensor outputs can be saved as predictions.")
+        self.predictions.write(output)
+        if isinstance(target, torch.Tensor):
+            self.targets.write(target)
@@ -0,0 +1,64 @@
+"""
+Registries of the models, datasets, metrics and losses that can be selected by name.
+Entries are "module:attribute" strings, imported the first time they are used, so
+running one model does not import the dependencies of all the others. Installed
+packages can add entries through entry points in a registry's group, e.g. in their
+setup.cfg:
+
+    [options.entry_points]
+    ai_toolkit.models =
+        MyModel = my_package.models:MyModel
+"""
+from __future__ import annotations
+
+import importlib
+from typing import Any
+
+try:
+    from importlib import metadata
+except ImportError:  # Python 3.7 has no importlib.metadata, so no plugins.
+    metadata = None  # type: ignore[assignment]
+
+
+class Registry:
+    def __init__(self, package: str, group: str, entries: dict[str, str]) -> None:
+        self.package = package
+        self.group = group
+        self.entries = entries
+        self.loaded: dict[str, Any] = {}
+        self.plugins: dict[str, Any] | None = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries or name in self.get_plugins()
+
+    def get_plugins(self) -> dict[str, Any]:
+        # Reading package metadata is slow, so it is only done for unknown names.
+        if self.plugins is None:
+            if metadata is None:
+                self.plugins = {}
+                return self.plugins
+            entry_points = metadata.entry_points()
+            if hasattr(entry_points, "select"):
+                selected = entry_points.select(group=self.group)
+            else:  # Python < 3.10 returns a dict of groups.
+                selected = entry_points.get(self.group, [])  # type: ignore[arg-type]
+            self.plugins = {entry_point.name: entry_point for entry_point in selected}
+        return self.plugins
+
+    def get(self, name: str) -> Any:
+        if name not in self.loaded:
+            if name in self.entries:
+                module_name, attribute = self.entries[name].split(":")
+                module = importlib.import_module(module_name, self.package)
+                self.loaded[name] = getattr(module, attribute)
+            elif name in self.get_plugins():
+                self.loaded[name] = self.get_plugins()[name].load()
+            else:
+                raise KeyError(name)
+        return self.loaded[name]
+
+    def module_getattr(self, module_name: str, name: str) -> Any:
+        """Module-level __getattr__, which only resolves this package's entries."""
+        if name not in self.entries:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        return self.get(name)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import time
+
+import torch
+
+
+class StepTimer:
+    """
+    Splits each step of train_and_validate into phases. Call lap(phase) at the end
+    of every phase and end_step() at the end of every batch. When disabled, every
+    call returns immediately.
+    """
+
+    PHASES = (
+        "data",
+        "forward",
+        "backward",
+        "optimizer",
+        "metrics",
+        "profiler",
+        "checkpoint",
+    )
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.sync_cuda = enabled and torch.cuda.is_available()
+        self.phase_times = dict.fromkeys(self.PHASES, 0.0)
+        self.step_times: list[float] = []
+        self.num_samples = 0
+        self.step_start = self.last = time.perf_counter()
+
+    def reset(self) -> None:
+        if self.enabled:
+            self.phase_times = dict.fromkeys(self.PHASES, 0.0)
+            self.step_times = []
+            self.num_samples = 0
+            self.step_start = self.last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        if self.enabled:
+            # Kernels run asynchronously, so wait for them to be charged correctly.
+            if self.sync_cuda:
+                torch.cuda.synchronize()
+            now = time.perf_counter()
+            self.phase_times[phase] += now - self.last
+            self.last = now
+
+    def end_step(self, batch_size: int) -> None:
+        if self.enabled:
+            self.step_times.append(self.last - self.step_start)
+            self.num_samples += batch_size
+            self.step_start = self.last
+
+    def summary(self) -> dict[str, float]:
+        if not self.step_times:
+            return {}
+        total_time = sum(self.step_times)
+        step_times = sorted(self.step_times)
+        result = {
+            "samples_per_sec": self.num_samples / total_time,
+            "data_wait_frac": self.phase_times["data"] / total_time,
+            "p50_step_ms": 1000 * step_times[int(0.5 * (len(step_times) - 1))],
+            "p95_step_ms": 1000 * step_times[int(0.95 * (len(step_times) - 1))],
+        }
+        for phase, phase_time in self.phase_times.items():
+            result[f"{phase}_frac"] = phase_time / total_time
+        return result
+
+    def __repr__(self) -> str:
+        summary = self.summary()
+        if not summary:
+            return ""
+        return (
+            f"| {summary['samples_per_sec']:.1f} samples/s, "
+            f"data wait: {100 * summary['data_wait_frac']:.1f}%, "
+            f"p50: {summary['p50_step_ms']:.2f}ms, "
+            f"p95: {summary['p95_step_ms']:.2f}ms"
+        )
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
+import contextlib
 import sys
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, cast
 
 import torch
 import torch.nn as nn
 
-from ai_toolkit import util
-from ai_toolkit.args import Arguments, init_pipeline
+from ai_toolkit import distributed, util
+from ai_toolkit.args import Arguments, get_parsed_arguments, init_pipeline
 from ai_toolkit.datasets import TensorDataLoader, get_dataset_initializer
 from ai_toolkit.losses import get_loss_initializer
+from ai_toolkit.metric_tracker import MetricTracker, Mode
 from ai_toolkit.models import get_model_initializer
+from ai_toolkit.predictions import PredictionWriter
 from ai_toolkit.verify import model_summary
 
 if "google.colab" in sys.modules:
@@ -23,39 +29,92 @@ def test_model(
     model: nn.Module,
     test_loader: TensorDataLoader,
     criterion: nn.Module,
-) -> None:
+    metrics: MetricTracker,
+    device: torch.device,
+    predictions_dir: Path | None = None,
+) -> dict[str, float]:
+    """
+    Evaluates args.metrics over the test set in Mode.TEST. Under torch.distributed,
+    each process evaluates its shard of the test set, and the metric sums are
+    reduced in float64 at the end. If predictions_dir is given, the outputs and
+    targets of every example are written there as they are computed.
+    """
     model.eval()
-    test_loss, correct = 0.0, 0.0
-    test_len = len(test_loader)
-    with torch.no_grad(), tqdm(desc="Test", total=test_len, ncols=120) as pbar:
-        for data, target in test_loader:
-            if isinstance(data, (list, tuple)):
-                output = model(*data)
-                batch_size = data[0].size(args.batch_dim)
-            else:
-                output = model(data)
-                batch_size = data.size(args.batch_dim)
-            loss = criterion(output, target)
-            test_loss += loss.item() * batch_size
-            pred = output.argmax(dim=1, keepdim=True)
-            correct += pred.eq(target.view_as(pred)).sum().item()
+    metrics.reset_hard()
+    num_batches = util.get_num_batches(test_loader)
+    with contextlib.ExitStack() as stack, torch.no_grad(), tqdm(
+        desc=str(Mode.TEST),
+        total=num_batches,
+        ncols=120,
+        disable=not distributed.is_main_process(),
+    ) as pbar:
+        writer = (
+            None
+            if predictions_dir is None
+            else stack.enter_context(PredictionWriter(predictions_dir))
+        )
+        for i, (data, target) in enumerate(test_loader):
+            with util.autocast(args.precision, device):
+                if isinstance(data, (list, tuple)):
+                    output = model(*data)
+                    batch_size = data[0].size(args.batch_dim)
+                else:
+                    output = model(data)
+                    batch_size = data.size(args.batch_dim)
+                loss = criterion(output, target)
+
+            # Metrics are always computed in fp32.
+            val_dict = {
+                "data": data,
+                "loss": loss.float(),
+                "output": output.float(),
+                "target": target,
+                "batch_size": batch_size,
+            }
+            tqdm_dict = metrics.batch_update(
+                SimpleNamespace(**val_dict), i, num_batches, Mode.TEST
+            )
+            if writer is not None:
+                writer.write(val_dict["output"], target)
+            if tqdm_dict:
+                pbar.set_postfix(tqdm_dict)
             pbar.update()
 
-    test_loss /= test_len
-    print(
-        f"\nTest set: Average loss: {test_loss:.4f},",
-        f"Accuracy: {correct}/{test_len} ({100. * correct / test_len:.2f}%)\n",
-    )
+    metrics.epoch_update(Mode.TEST)
+    return {name: metric.value for name, metric in metrics.metric_data.items()}
 
 
-def test(*arg_list: str) -> None:
+def test(*arg_list: str) -> dict[str, float]:
+    """
+    With --nproc N, the test set is split between N processes. Each one memory-maps
+    the same checkpoint file, so the model weights are read from the page cache.
+    --save-predictions writes the outputs to the checkpoint's run directory. Both
+    are read from the command line, not from the checkpoint's args.json.
+    """
+    cli_args = get_parsed_arguments(arg_list)
+    if cli_args.nproc > 1 and not distributed.is_initialized():
+        return cast(
+            Dict[str, float], distributed.launch(test, arg_list, cli_args.nproc)
+        )
+
+    predictions_dir = None
+    if cli_args.save_predictions:
+        if not cli_args.checkpoint:
+            raise RuntimeError("--save-predictions requires a --checkpoint.")
+        predictions_dir = cli_args.save_dir / cli_args.checkpoint
     args, device, checkpoint = init_pipeline(*arg_list)
     criterion = get_loss_initializer(args.loss)()
     test_loader = get_dataset_initializer(args.dataset).load_test_data(args, device)
     init_params = checkpoint.get("model_init", [])
     model = get_model_initializer(args.model)(*init_params).to(device)
     util.load_state_dict(checkpoint, model)
-    sample_loader = util.get_sample_loader(test_loader)
-    model_summary(args, model, sample_loader)
+    if distributed.is_main_process():
+        sample_loader = util.get_sample_loader(test_loader)
+        model_summary(args, model, sample_loader)
 
-    test_model(args, model, test_loader, criterion)
+    # Evaluation must not rewrite the run's args.json, nor start a new run.
+    args.no_save = True
+    metrics = MetricTracker(args, checkpoint)
+    return test_model(
+        args, model, test_loader, criterion, metrics, device, predictions_dir
+    )
@@ -2,16 +2,18 @@ from __future__ import annotations
 
 import random
 import sys
+from pathlib import Path
 from types import SimpleNamespace
-from typing import Any, Iterator
+from typing import Any, Callable, Iterator, Mapping, cast
 
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
 import torch.optim.lr_scheduler as lr_scheduler
+from torch.nn.parallel import DistributedDataParallel
 
-from ai_toolkit import util
+from ai_toolkit import distributed, util
 from ai_toolkit.args import Arguments, init_pipeline
 from ai_toolkit.datasets import TensorDataLoader, get_dataset_initializer
 from ai_toolkit.losses import get_loss_initializer
@@ -34,49 +36,119 @@ def train_and_validate(
     criterion: nn.Module,
     metrics: MetricTracker,
     mode: Mode,
+    scaler: torch.cuda.amp.GradScaler | None = None,
+    profiler: torch.profiler.profile | None = None,
+    batches: Iterator[Any] | None = None,
+    start_step: int = 0,
+    step_fn: Callable[[int], None] | None = None,
 ) -> None:
+    """
+    To resume in the middle of an epoch, pass the loader's iterator positioned
+    after start_step batches as batches. step_fn is called after every batch with
+    the number of batches done so far.
+    """
     if mode == Mode.TRAIN:
         model.train()
     else:
         model.eval()
 
+    device = next(model.parameters()).device
+
     torch.set_grad_enabled(mode == Mode.TRAIN)
-    metrics.reset_hard()
-    num_batches = len(loader)
-    with tqdm(desc=str(mode), total=num_batches, ncols=120) as pbar:
-        for i, (data, target) in enumerate(loader):
+    if start_step == 0:
+        # Otherwise the metrics hold the partial epoch restored from a checkpoint.
+        metrics.reset_hard()
+    else:
+        # Timings only cover the steps run since resuming, not the seek before.
+        metrics.timer.reset()
+    timer = metrics.timer
+    num_batches = util.get_num_batches(loader)
+    with tqdm(
+        desc=str(mode),
+        total=num_batches,
+        ncols=120,
+        initial=start_step,
+        disable=not distributed.is_main_process(),
+    ) as pbar:
+        for i, (data, target) in enumerate(
+            loader if batches is None else batches, start_step
+        ):
+            timer.lap("data")
             # If you have multiple optimizers, use model.zero_grad().
             # If you want to freeze layers, use optimizer.zero_grad().
             if mode == Mode.TRAIN and optimizer is not None:
                 optimizer.zero_grad(set_to_none=True)
 
-            if isinstance(data, (list, tuple)):
-                output = model(*data)
-                batch_size = data[0].size(args.batch_dim)
-            else:
-                output = model(data)
-                batch_size = data.size(args.batch_dim)
+            with util.autocast(args.precision, device):
+                if isinstance(data, (list, tuple)):
+                    output = model(*data)
+                    batch_size = data[0].size(args.batch_dim)
+                else:
+                    output = model(data)
+                    batch_size = data.size(args.batch_dim)
+
+                loss = criterion(output, target)
+            timer.lap("forward")
 
-            loss = criterion(output, target)
             if mode == Mode.TRAIN and optimizer is not None:
-                loss.backward()
-                optimizer.step()
+                if scaler is None:
+                    loss.backward()
+                    timer.lap("backward")
+                    optimizer.step()
+                else:
+                    scaler.scale(loss).backward()
+                    timer.lap("backward")
+                    scaler.step(optimizer)
+                    scaler.update()
+                timer.lap("optimizer")
 
+            # Metrics are always computed in fp32.
             val_dict = {
                 "data": data,
-                "loss": loss,
-                "output": output,
+                "loss": loss.float(),
+                "output": output.float(),
                 "target": target,
                 "batch_size": batch_size,
             }
             tqdm_dict = metrics.batch_update(
                 SimpleNamespace(**val_dict), i, num_batches, mode
             )
-            pbar.set_postfix(tqdm_dict)
+            if tqdm_dict:
+                pbar.set_postfix(tqdm_dict)
             pbar.update()
+            timer.lap("metrics")
+            if profiler is not None:
+                profiler.step()
+            timer.lap("profiler")
+            if step_fn is not None:
+                step_fn(i + 1)
+            timer.lap("checkpoint")
+            timer.end_step(batch_size)
     metrics.epoch_update(mode)
 
 
+def resume_batches(
+    args: Arguments, loader: TensorDataLoader, checkpoint: Mapping[str, Any]
+) -> Iterator[Any]:
+    """
+    Recreates the loader's iterator as it was when a mid-epoch checkpoint was
+    saved. The torch RNG is rewound to the start of the epoch, so the sampler
+    reproduces the same order, and the batches already trained on are skipped, or
+    sought past if the sampler supports it. Then every RNG is restored.
+    """
+    step_state = checkpoint["step_state"]
+    torch.set_rng_state(step_state["epoch_rng_state"])
+    num_skipped = step_state["step"]
+    if hasattr(loader.sampler, "seek"):
+        loader.sampler.seek(num_skipped * args.batch_size)
+        num_skipped = 0
+    batches = iter(loader)
+    for _ in range(num_skipped):
+        next(batches)
+    util.set_rng_state(checkpoint)
+    return batches
+
+
 def get_optimizer(args: Arguments, model: nn.Module) -> optim.Optimizer:
     params = filter(lambda p: p.requires_grad, model.parameters())
     return optim.AdamW(params, lr=args.lr)
@@ -104,42 +176,116 @@ def load_model(
 
 def train(*arg_list: str) -> MetricTracker:
     args, device, checkpoint = init_pipeline(*arg_list)
+    if args.profile and args.no_save:
+        # Traces are written to the run directory, which --no-save never creates.
+        raise RuntimeError("--profile cannot be used with --no-save.")
+    if args.nproc > 1 and not distributed.is_initialized():
+        if args.checkpoint_every_steps:
+            # Only rank 0 saves, but every rank holds its own partial metrics.
+            raise RuntimeError("--checkpoint-every-steps requires --nproc=1.")
+        if args.stream:
+            # Ranks stream different files, so they would run different numbers of
+            # steps, and DDP would wait forever on the rank that stopped first.
+            raise RuntimeError("--stream requires --nproc=1.")
+        return cast(MetricTracker, distributed.launch(train, arg_list, args.nproc))
+
     dataset_loader = get_dataset_initializer(args.dataset)
     train_loader, val_loader, init_params = dataset_loader.load_train_data(args, device)
     sample_loader = util.get_sample_loader(train_loader)
     model, criterion, optimizer, scheduler = load_model(
         args, device, init_params, sample_loader
     )
-    util.load_state_dict(checkpoint, model, optimizer, scheduler)
+    scaler = util.get_grad_scaler(args.precision, device)
+    util.load_state_dict(checkpoint, model, optimizer, scheduler, scaler)
     metrics = MetricTracker(args, checkpoint, dataset_loader.CLASS_LABELS)
-    visualize(args, model, sample_loader, metrics)
+    if distributed.is_main_process():
+        visualize(args, model, sample_loader, metrics)
+
+    # Checkpoints always store the unwrapped model's state_dict.
+    train_model = model
+    if distributed.is_initialized():
+        distributed.broadcast_optimizer_state(optimizer)
+        train_model = DistributedDataParallel(model)
 
     util.set_rng_state(checkpoint)
-    for _ in range(args.epochs):
-        metrics.next_epoch()
-        train_and_validate(
-            args, model, train_loader, optimizer, criterion, metrics, Mode.TRAIN
-        )
-        train_and_validate(args, model, val_loader, None, criterion, metrics, Mode.VAL)
-        if scheduler is not None:
-            scheduler.step()
-
-        if not args.no_save:
-            checkpoint_dict = {
-                "model_init": init_params,
-                "model_state_dict": model.state_dict(),
-                "optimizer_state_dict": optimizer.state_dict(),
-                "scheduler_state_dict": (
-                    None if scheduler is None else scheduler.state_dict()
-                ),
-                "rng_state": random.getstate(),
-                "np_rng_state": np.random.get_state(),
-                "torch_rng_state": torch.get_rng_state(),
-                "run_name": metrics.run_name,
-                "metric_obj": metrics.json_repr(),
-            }
-            util.save_checkpoint(checkpoint_dict, metrics.is_best)
+    checkpoint_writer = util.CheckpointWriter()
+
+    def save_checkpoint(is_best: bool, step_state: dict[str, Any] | None) -> None:
+        if args.no_save or not distributed.is_main_process():
+            return
+        metric_obj = metrics.json_repr()
+        if step_state is not None:
+            # The epoch is unfinished, so resuming starts it again at step_state.
+            metric_obj["epoch"] -= 1
+        checkpoint_dict = {
+            "model_init": init_params,
+            "model_state_dict": model.state_dict(),
+            "optimizer_state_dict": optimizer.state_dict(),
+            "scheduler_state_dict": (
+                None if scheduler is None else scheduler.state_dict()
+            ),
+            "scaler_state_dict": scaler.state_dict(),
+            "rng_state": random.getstate(),
+            "np_rng_state": np.random.get_state(),
+            "torch_rng_state": torch.get_rng_state(),
+            "run_name": metrics.run_name,
+            "metric_obj": metric_obj,
+            "step_state": step_state,
+        }
+        checkpoint_writer.save(checkpoint_dict, is_best)
+
+    def save_step_checkpoint(step: int) -> None:
+        if step % args.checkpoint_every_steps == 0 and step != num_batches:
+            # Partial metrics are saved as Python floats, whatever the device.
+            for metric in metrics.metric_data.values():
+                metric.materialize()
+            save_checkpoint(False, {"step": step, "epoch_rng_state": epoch_rng_state})
+
+    profiler_ctx = util.get_profiler(
+        args.profile and distributed.is_main_process(), Path(metrics.run_name)
+    )
+    resume_state = checkpoint.get("step_state")
+    num_batches = util.get_num_batches(train_loader)
+    try:
+        with profiler_ctx as profiler:
+            for _ in range(args.epochs):
+                metrics.next_epoch()
+                util.set_sampler_epoch(train_loader, metrics.epoch)
+                epoch_rng_state = torch.get_rng_state()
+                batches, start_step = None, 0
+                if resume_state is not None:
+                    batches = resume_batches(args, train_loader, checkpoint)
+                    start_step = resume_state["step"]
+                    epoch_rng_state = resume_state["epoch_rng_state"]
+                    resume_state = None
+
+                train_and_validate(
+                    args,
+                    train_model,
+                    train_loader,
+                    optimizer,
+                    criterion,
+                    metrics,
+                    Mode.TRAIN,
+                    scaler,
+                    profiler,
+                    batches,
+                    start_step,
+                    save_step_checkpoint if args.checkpoint_every_steps else None,
+                )
+                train_and_validate(
+                    args, train_model, val_loader, None, criterion, metrics, Mode.VAL
+                )
+                if scheduler is not None:
+                    scheduler.step()
+
+                save_checkpoint(metrics.is_best, None)
+    finally:
+        # Make sure the last checkpoint is complete, even if training crashed.
+        checkpoint_writer.close()
 
+    metrics.flush()
     torch.set_grad_enabled(True)
-    visualize_trained(args, model, sample_loader, metrics)
+    if distributed.is_main_process():
+        visualize_trained(args, model, sample_loader, metrics)
     return metrics
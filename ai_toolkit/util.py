@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import contextlib
+import copy
+import inspect
+import os
+import queue
 import random
 import shutil
+import threading
 from pathlib import Path
-from typing import Any, Iterator, Tuple
+from typing import Any, ContextManager, Iterator, Mapping, Tuple
 
 import numpy as np
 import torch
@@ -12,9 +18,24 @@ import torch.optim as optim
 import torch.optim.lr_scheduler as lr_scheduler
 from torch.utils.data import DataLoader
 
+from ai_toolkit import checkpoint_file
+
 # Redefining here to avoid circular import
 TensorDataLoader = DataLoader[Tuple[torch.Tensor, ...]]
 
+PRECISION_DTYPES = {
+    "fp32": torch.float32,
+    "bf16": torch.bfloat16,
+    "fp16": torch.float16,
+}
+# Legacy checkpoints pickle numpy RNG state and Metric objects, which newer versions
+# of torch.load reject unless weights_only=False is passed.
+LEGACY_LOAD_KWARGS: dict[str, Any] = (
+    {"weights_only": False}
+    if "weights_only" in inspect.signature(torch.load).parameters
+    else {}
+)
+
 
 def get_sample_loader(loader: TensorDataLoader) -> Iterator[Any]:
     """Returns a generator that outputs a single batch of data."""
@@ -26,7 +47,80 @@ def get_sample_loader(loader: TensorDataLoader) -> Iterator[Any]:
             sample_loader = iter(loader)
 
 
-def set_rng_state(checkpoint: dict[str, Any]) -> None:
+def get_num_batches(loader: TensorDataLoader) -> int | None:
+    """Returns None for loaders over an IterableDataset without a length."""
+    try:
+        return len(loader)
+    except TypeError:
+        return None
+
+
+def autocast(precision: str, device: torch.device) -> torch.autocast:
+    """
+    Returns an autocast context for the forward pass and loss. fp32 returns a
+    disabled context, so callers can always wrap their code in it.
+    """
+    return torch.autocast(
+        device.type, dtype=PRECISION_DTYPES[precision], enabled=precision != "fp32"
+    )
+
+
+def get_grad_scaler(precision: str, device: torch.device) -> torch.cuda.amp.GradScaler:
+    """
+    fp16 gradients can underflow, so they are scaled. bf16 has the same exponent
+    range as fp32 and does not need a scaler, so the returned scaler is a no-op.
+    """
+    return torch.cuda.amp.GradScaler(
+        enabled=precision == "fp16" and device.type == "cuda"
+    )
+
+
+def get_profiler(
+    enabled: bool, run_dir: Path, wait: int = 1, warmup: int = 1, active: int = 5
+) -> ContextManager[torch.profiler.profile | None]:
+    """
+    Returns a torch.profiler context that skips `wait` steps, warms up for `warmup`
+    steps and then records `active` steps once. Op timings, memory allocations and
+    stack traces are written to <run_dir>/profiler as Chrome trace files, which the
+    TensorBoard profiler plugin also reads. Call profiler.step() after every batch.
+    """
+    if not enabled:
+        return contextlib.nullcontext()
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    return torch.profiler.profile(
+        activities=activities,
+        schedule=torch.profiler.schedule(
+            wait=wait, warmup=warmup, active=active, repeat=1
+        ),
+        on_trace_ready=torch.profiler.tensorboard_trace_handler(
+            str(run_dir / "profiler")
+        ),
+        record_shapes=True,
+        profile_memory=True,
+        with_stack=True,
+    )
+
+
+def set_sampler_epoch(loader: TensorDataLoader, epoch: int) -> None:
+    """
+    Reseeds samplers that shuffle per epoch, e.g. DistributedSampler, and loaders
+    or datasets that shuffle themselves, e.g. TensorBatchLoader or
+    StreamingTextDataset.
+    """
+    samplers: tuple[Any, ...] = (
+        loader,
+        loader.sampler,
+        getattr(loader, "batch_sampler", None),
+        getattr(loader, "dataset", None),
+    )
+    for sampler in samplers:
+        if hasattr(sampler, "set_epoch"):
+            sampler.set_epoch(epoch)
+
+
+def set_rng_state(checkpoint: Mapping[str, Any]) -> None:
     if checkpoint:
         random.setstate(checkpoint["rng_state"])
         np.random.set_state(checkpoint["np_rng_state"])
@@ -35,8 +129,8 @@ def set_rng_state(checkpoint: dict[str, Any]) -> None:
 
 def save_checkpoint(state: dict[str, Any], is_best: bool, run_name: str = "") -> None:
     """
-    Saves model and training parameters at checkpoint + 'last.pth.tar'.
-    If is_best is True, also saves best.pth.tar
+    Saves model and training parameters at checkpoint + 'checkpoint.ckpt'.
+    If is_best is True, also saves model_best.ckpt
     Args:
         state: (dict) contains model's state_dict, may contain other keys such as
         epoch, optimizer_state_dict
@@ -44,30 +138,124 @@ def save_checkpoint(state: dict[str, Any], is_best: bool, run_name: str = "") ->
         is_best: (bool) True if it is the best model seen till now
     """
     print("Saving checkpoint...\n")
-    run_name_path = Path(run_name or state["run_name"])
-    save_path = run_name_path / "checkpoint.pth.tar"
-    torch.save(state, save_path)
     if is_best:
         print("Saving new model_best...\n")
-        shutil.copyfile(save_path, run_name_path / "model_best.pth.tar")
+    write_checkpoint(state, is_best, run_name)
+
+
+def write_checkpoint(state: dict[str, Any], is_best: bool, run_name: str = "") -> None:
+    """
+    Writes to a temp file and renames it, so an interrupted save never leaves a
+    truncated checkpoint. model_best is a hard link to the same file instead of a
+    copy; later saves replace checkpoint.ckpt with a new file, so the link keeps
+    pointing at the best one.
+    """
+    run_name_path = Path(run_name or state["run_name"])
+    save_path = run_name_path / "checkpoint.ckpt"
+    tmp_path = save_path.with_name(f"{save_path.name}.tmp")
+    checkpoint_file.save(state, tmp_path)
+    os.replace(tmp_path, save_path)
+    if is_best:
+        best_path = run_name_path / "model_best.ckpt"
+        tmp_best_path = best_path.with_name(f"{best_path.name}.tmp")
+        if tmp_best_path.exists():
+            tmp_best_path.unlink()
+        try:
+            os.link(save_path, tmp_best_path)
+        except OSError:
+            shutil.copyfile(save_path, tmp_best_path)
+        os.replace(tmp_best_path, best_path)
+
+
+def snapshot_state(obj: Any) -> Any:
+    """
+    Copies tensors to the CPU and deep-copies everything else, so training can keep
+    mutating the model, optimizer and metrics while the snapshot is serialized.
+    """
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: snapshot_state(val) for key, val in obj.items()}
+    if type(obj) in (list, tuple):
+        return type(obj)(snapshot_state(val) for val in obj)
+    return copy.deepcopy(obj)
+
+
+class CheckpointWriter:
+    """
+    Saves checkpoints on a background thread. The queue is bounded and save()
+    waits for the previous write, so at most one checkpoint is in flight.
+    """
+
+    def __init__(self) -> None:
+        self.queue: queue.Queue[tuple[dict[str, Any], bool, str] | None] = queue.Queue(
+            maxsize=1
+        )
+        self.error: BaseException | None = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            state, is_best, run_name = item
+            try:
+                write_checkpoint(state, is_best, run_name)
+            except BaseException as e:  # pylint: disable=broad-except
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def save(self, state: dict[str, Any], is_best: bool, run_name: str = "") -> None:
+        self.flush()
+        print("Saving checkpoint...\n")
+        if is_best:
+            print("Saving new model_best...\n")
+        self.queue.put((snapshot_state(state), is_best, run_name))
+
+    def flush(self) -> None:
+        """Blocks until pending writes finish, re-raising any error they hit."""
+        self.queue.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("Failed to write checkpoint.") from error
+
+    def close(self) -> None:
+        """Flushes pending writes, then stops the writer thread."""
+        try:
+            self.flush()
+        finally:
+            if self.thread.is_alive():
+                self.queue.put(None)
+                self.thread.join()
 
 
-def load_checkpoint(checkpoint_path: Path, use_best: bool = False) -> dict[str, Any]:
+def load_checkpoint(checkpoint_path: Path, use_best: bool = False) -> Mapping[str, Any]:
     """
-    Loads torch checkpoint.
+    Loads checkpoint. Sectioned .ckpt files are memory-mapped and each section is
+    only decoded when it is accessed; older .pth.tar files are loaded with torch.load.
     Args:
         checkpoint_path: (string) filename which needs to be loaded
     """
-    load_file = "model_best.pth.tar" if use_best else "checkpoint.pth.tar"
-    checkpoint: dict[str, Any] = torch.load(checkpoint_path / load_file)
+    load_file = "model_best" if use_best else "checkpoint"
+    ckpt_path = checkpoint_path / f"{load_file}.ckpt"
+    if ckpt_path.is_file():
+        return checkpoint_file.load(ckpt_path)
+    checkpoint: dict[str, Any] = torch.load(
+        checkpoint_path / f"{load_file}.pth.tar", **LEGACY_LOAD_KWARGS
+    )
     return checkpoint
 
 
 def load_state_dict(
-    checkpoint: dict[str, Any],
+    checkpoint: Mapping[str, Any],
     model: nn.Module,
     optimizer: optim.Optimizer | None = None,
     scheduler: lr_scheduler._LRScheduler | None = None,
+    scaler: torch.cuda.amp.GradScaler | None = None,
 ) -> None:
     """
     Loads model parameters (state_dict) from checkpoint. If optimizer or scheduler are
@@ -76,6 +264,7 @@ def load_state_dict(
         checkpoint: () checkpoint object
         model: (torch.nn.Module) model for which the parameters are loaded
         optimizer: (torch.optim) optional: resume optimizer from checkpoint
+        scaler: (torch.cuda.amp.GradScaler) optional: resume grad scaler, if saved
     """
     if checkpoint:
         print("Loading checkpoint...")
@@ -84,3 +273,5 @@ def load_state_dict(
             optimizer.load_state_dict(checkpoint["optimizer_state_dict"])
         if scheduler is not None:
             scheduler.load_state_dict(checkpoint["scheduler_state_dict"])
+        if scaler is not None and "scaler_state_dict" in checkpoint:
+            scaler.load_state_dict(checkpoint["scaler_state_dict"])
@@ -7,6 +7,7 @@ import torch.nn as nn
 import torch.optim as optim
 import torchinfo
 
+from ai_toolkit import util
 from ai_toolkit.args import Arguments
 
 if "google.colab" in sys.modules:
@@ -29,10 +30,11 @@ def verify_model(
     in order to overfit the batch.
     """
     if not args.no_verify:
-        model_summary(args, model, loader)
-        check_batch_dimension(model, loader, optimizer)
-        overfit_example(model, loader, optimizer, criterion, device, args.batch_dim)
-        check_all_layers_training(model, loader, optimizer, criterion)
+        with util.autocast(args.precision, device):
+            model_summary(args, model, loader)
+            check_batch_dimension(model, loader, optimizer)
+            overfit_example(model, loader, optimizer, criterion, device, args.batch_dim)
+            check_all_layers_training(model, loader, optimizer, criterion)
         detect_NaN_tensors(model)
         print("Verification complete - all tests passed!")
 
@@ -1,6 +1,8 @@
 from .activations import compute_activations
 from .class_viz import create_class_visualization
+from .confusion import plot_confusion_matrix
 from .fooling import make_fooling_image
+from .roc import plot_roc_curves
 from .saliency import show_saliency_maps
 from .view_input import view_input
 
@@ -8,6 +10,8 @@ __all__ = (
     "compute_activations",
     "create_class_visualization",
     "make_fooling_image",
+    "plot_confusion_matrix",
+    "plot_roc_curves",
     "show_saliency_maps",
     "view_input",
 )
@@ -1,32 +1,50 @@
-# from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+from __future__ import annotations
 
-# import numpy as np
-# import matplotlib.pyplot as plt
-# import torch
-# from .viz_utils import save_figure
+from typing import TYPE_CHECKING
 
-# def confusion_matrix(model, loader, class_labels, run_name):
-#     output = model(data)
+import matplotlib.pyplot as plt  # type: ignore[import]
+import torch
 
-#     output.cpu().numpy()
-#     pred_idx = torch.max(pred, 1)[1].data.int()
-#     y_true += list(targets.int())
-#     y_pred += list(pred_idx)
+from .viz_utils import save_figure
 
-# # token2id, tag2id
-# def evaluate_test_set(model, test, x_to_ix, y_to_ix):
-#     y_true = list()
-#     y_pred = list()
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
 
-#     for batch, targets, lengths, raw_data in \
-#         utils.create_dataset(test, x_to_ix, y_to_ix, batch_size=1):
-#         batch, targets, lengths = utils.sort_batch(batch, targets, lengths)
 
-#         pred = model(torch.autograd.Variable(batch), lengths.cpu().numpy())
-#         pred_idx = torch.max(pred, 1)[1]
-#         y_true += list(targets.int())
-#         y_pred += list(pred_idx.data.int())
+def plot_confusion_matrix(
+    matrix: torch.Tensor,
+    class_labels: list[str],
+    run_name: str,
+    tag: str,
+    writer: SummaryWriter | None = None,
+    step: int = 0,
+) -> None:
+    """
+    Plots a confusion matrix with a row per target class and a column per predicted
+    class, saves it as <tag>.png, and adds it to TensorBoard if there is a writer.
+    """
+    matrix = matrix.cpu()
+    num_classes = matrix.shape[0]
+    labels = class_labels or [str(i) for i in range(num_classes)]
+    fig, ax = plt.subplots(figsize=(max(4, num_classes / 2), max(4, num_classes / 2)))
+    image = ax.imshow(matrix.numpy(), cmap="Blues")
+    fig.colorbar(image, ax=ax)
+    ax.set_xticks(range(num_classes))
+    ax.set_yticks(range(num_classes))
+    ax.set_xticklabels(labels, rotation=90)
+    ax.set_yticklabels(labels)
+    ax.set_xlabel("Predicted")
+    ax.set_ylabel("Target")
+    if num_classes <= 20:
+        threshold = matrix.max().item() / 2
+        for i in range(num_classes):
+            for j in range(num_classes):
+                count = matrix[i, j].item()
+                color = "white" if count > threshold else "black"
+                ax.text(j, i, str(count), ha="center", va="center", color=color)
+    ax.set_title(tag)
 
-#     print(len(y_true), len(y_pred))
-#     print(classification_report(y_true, y_pred))
-#     print(confusion_matrix(y_true, y_pred))
+    if writer is not None:
+        writer.add_figure(tag, fig, step, close=False)
+    save_figure(run_name, f"{tag}.png")
+    plt.close(fig)
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import matplotlib.pyplot as plt  # type: ignore[import]
+import torch
+
+from .viz_utils import save_figure
+
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
+
+MAX_LEGEND_ENTRIES = 10
+
+
+def plot_roc_curves(
+    fpr: torch.Tensor,
+    tpr: torch.Tensor,
+    areas: torch.Tensor,
+    labels: list[str],
+    run_name: str,
+    tag: str,
+    writer: SummaryWriter | None = None,
+    step: int = 0,
+) -> None:
+    """
+    Plots one ROC curve per row of fpr and tpr, saves the plot as <tag>.png, and
+    adds it to TensorBoard if there is a writer.
+    """
+    fig, ax = plt.subplots(figsize=(5, 5))
+    for x, y, area, label in zip(fpr.cpu(), tpr.cpu(), areas.tolist(), labels):
+        ax.plot(x.numpy(), y.numpy(), label=f"{label} ({area:.3f})")
+    ax.plot([0, 1], [0, 1], color="gray", linestyle="--")
+    ax.set_xlabel("False positive rate")
+    ax.set_ylabel("True positive rate")
+    if len(labels) <= MAX_LEGEND_ENTRIES:
+        ax.legend(loc="lower right")
+    ax.set_title(tag)
+
+    if writer is not None:
+        writer.add_figure(tag, fig, step, close=False)
+    save_figure(run_name, f"{tag}.png")
+    plt.close(fig)
@@ -9,13 +9,6 @@ from ai_toolkit.args import Arguments, init_pipeline
 from ai_toolkit.datasets import get_dataset_initializer
 from ai_toolkit.metric_tracker import MetricTracker
 from ai_toolkit.models import get_model_initializer
-from ai_toolkit.visualizations import (
-    compute_activations,
-    create_class_visualization,
-    make_fooling_image,
-    show_saliency_maps,
-    view_input,
-)
 
 
 def viz() -> None:
@@ -38,6 +31,10 @@ def visualize(
     metrics: MetricTracker | None = None,
 ) -> None:
     if not args.no_visualize and metrics is not None:
+        # matplotlib is only imported when visualizing.
+        # pylint: disable-next=import-outside-toplevel
+        from ai_toolkit.visualizations import compute_activations, view_input
+
         metrics.add_network(model, loader)
 
         run_name = metrics.run_name
@@ -54,6 +51,13 @@ def visualize_trained(
     metrics: MetricTracker | None = None,
 ) -> None:
     if not args.no_visualize and metrics is not None:
+        # pylint: disable-next=import-outside-toplevel
+        from ai_toolkit.visualizations import (
+            create_class_visualization,
+            make_fooling_image,
+            show_saliency_maps,
+        )
+
         run_name = metrics.run_name
         data, target = next(loader)
         make_fooling_image(
@@ -0,0 +1,4 @@
+from ai_toolkit import pack
+
+if __name__ == "__main__":
+    pack()
@@ -0,0 +1,53 @@
+""" bucket_sampler_test.py """
+from typing import List
+
+import torch
+
+from ai_toolkit.datasets.dataset import BucketBatchSampler
+
+
+class CountingSampler(BucketBatchSampler):
+    num_builds = 0
+
+    def build_batches(self) -> List[List[int]]:
+        self.num_builds += 1
+        return super().build_batches()
+
+
+class TestBucketBatchSampler:
+    @staticmethod
+    def test_token_budget() -> None:
+        lengths = torch.randint(
+            1, 20, (500,), generator=torch.Generator().manual_seed(1)
+        )
+        sampler = BucketBatchSampler(lengths, batch_size=4, max_tokens=64)
+
+        batches = list(sampler)
+
+        assert sorted(i for batch in batches for i in batch) == list(range(500))
+        assert all(len(b) * int(lengths[b].max()) <= 64 for b in batches)
+        assert len(sampler) == len(batches)
+
+    @staticmethod
+    def test_reproducible_per_epoch() -> None:
+        lengths = torch.arange(100) % 7
+        sampler = BucketBatchSampler(lengths, batch_size=8, seed=3)
+
+        first = list(sampler)
+        sampler.set_epoch(1)
+        second = list(sampler)
+        sampler.set_epoch(0)
+
+        assert list(sampler) == first
+        assert second != first
+        assert all(len(batch) <= 8 for batch in first)
+
+    @staticmethod
+    def test_batches_built_once_per_epoch() -> None:
+        sampler = CountingSampler(torch.arange(100) % 7, batch_size=8)
+
+        for epoch in range(2):
+            sampler.set_epoch(epoch)
+            assert len(sampler) == len(list(sampler)) == len(sampler)
+
+        assert sampler.num_builds == 2
@@ -0,0 +1,60 @@
+""" dataset_penn_test.py """
+from pathlib import Path
+
+import numpy as np
+from PIL import Image  # type: ignore[import]
+
+from ai_toolkit.datasets.dataset_penn import PennFudanDataset, rle_decode, rle_encode
+
+
+class TestPennFudanDataset:
+    @staticmethod
+    def test_rle_round_trip() -> None:
+        rng = np.random.default_rng(0)
+        for mask in (rng.random((7, 5)) < 0.5, np.ones((3, 4), dtype=bool)):
+            assert (rle_decode(rle_encode(mask), mask.shape) == mask).all()
+
+    @staticmethod
+    def test_cached_example(tmp_path: Path) -> None:
+        (tmp_path / "PNGImages").mkdir()
+        (tmp_path / "PedMasks").mkdir()
+        img = np.arange(6 * 8 * 3, dtype=np.uint8).reshape(6, 8, 3)
+        mask = np.zeros((6, 8), dtype=np.uint8)
+        mask[1:3, 2:5] = 1
+        mask[4:6, 0:2] = 2
+        Image.fromarray(img).save(tmp_path / "PNGImages" / "a.png")
+        Image.fromarray(mask).save(tmp_path / "PedMasks" / "a_mask.png")
+
+        for _ in range(2):  # builds the cache, then reads it back
+            image, target = PennFudanDataset(tmp_path)[0]
+
+            assert (image == img).all()
+            assert target["boxes"].tolist() == [[2, 1, 4, 2], [0, 4, 1, 5]]
+            assert target["area"].tolist() == [2, 1]
+            assert (target["masks"].numpy() == [mask == 1, mask == 2]).all()
+            assert target["labels"].tolist() == [1, 1]
+        assert not list((tmp_path / ".penn_cache").glob("*.tmp"))
+
+    @staticmethod
+    def test_rebuilds_stale_cache(tmp_path: Path) -> None:
+        (tmp_path / "PNGImages").mkdir()
+        (tmp_path / "PedMasks").mkdir()
+        img = np.zeros((4, 4, 3), dtype=np.uint8)
+        mask = np.zeros((4, 4), dtype=np.uint8)
+        Image.fromarray(img).save(tmp_path / "PNGImages" / "a.png")
+        Image.fromarray(mask).save(tmp_path / "PedMasks" / "a_mask.png")
+
+        _, target = PennFudanDataset(tmp_path)[0]
+
+        assert target["boxes"].shape == (0, 4)
+        assert target["masks"].shape == (0, 4, 4)
+
+        Image.fromarray(img).save(tmp_path / "PNGImages" / "b.png")
+        mask[1:3, 1:3] = 1
+        Image.fromarray(mask).save(tmp_path / "PedMasks" / "b_mask.png")
+
+        dataset = PennFudanDataset(tmp_path)
+        _, target = dataset[1]
+
+        assert len(dataset) == 2
+        assert target["boxes"].tolist() == [[1, 1, 2, 2]]
@@ -0,0 +1,15 @@
+""" dataset_rnn_test.py """
+from ai_toolkit.datasets.dataset_rnn import ALL_LETTERS, LanguageWords
+
+
+class TestLanguageWords:
+    @staticmethod
+    def test_encode_lines() -> None:
+        lines = ["abZ", "Z.", ""]
+
+        letters = LanguageWords.encode_lines(lines)
+
+        expected = [
+            [ALL_LETTERS.index(c) for c in line.ljust(3, "a")] for line in lines
+        ]
+        assert letters.tolist() == expected
@@ -0,0 +1,51 @@
+""" permutation_test.py """
+import torch
+from torch.utils.data import TensorDataset
+
+from ai_toolkit.datasets.permutation import (
+    FeistelPermutation,
+    PermutationSampler,
+    PermutationSubset,
+)
+
+
+class TestFeistelPermutation:
+    @staticmethod
+    def test_bijection() -> None:
+        for n in (1, 2, 7, 100, 5000):
+            permutation = FeistelPermutation(n, 0, 1)
+
+            order = list(permutation.iter_range(0, n))
+
+            assert sorted(order) == list(range(n))
+            assert [permutation[i] for i in range(0, n, 7)] == order[::7]
+
+    @staticmethod
+    def test_subsets() -> None:
+        dataset = TensorDataset(torch.arange(100))
+        permutation = FeistelPermutation(len(dataset), 0)
+
+        train_set = PermutationSubset(dataset, permutation, 0, 80)
+        val_set = PermutationSubset(dataset, permutation, 80, 20)
+
+        train_items = [int(train_set[i][0]) for i in range(80)]
+        items = train_items + [int(val_set[i][0]) for i in range(20)]
+        assert sorted(items) == list(range(100))
+        assert train_set.indices.tolist() == items[:80]
+
+
+class TestPermutationSampler:
+    @staticmethod
+    def test_epochs_and_seek() -> None:
+        sampler = PermutationSampler(range(50), seed=3)
+        first_epoch = list(sampler)
+        sampler.set_epoch(1)
+        second_epoch = list(sampler)
+
+        sampler.seek(20)
+
+        assert len(sampler) == 50
+        assert list(sampler) == second_epoch[20:]
+        assert list(sampler) == second_epoch
+        assert first_epoch != second_epoch
+        assert sorted(first_epoch) == sorted(second_epoch) == list(range(50))
@@ -0,0 +1,40 @@
+""" prefetch_loader_test.py """
+from typing import Iterator
+
+import pytest
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from ai_toolkit.datasets import PrefetchLoader
+
+
+class TestPrefetchLoader:
+    @staticmethod
+    def test_batches() -> None:
+        dataset = TensorDataset(torch.arange(10.0), torch.arange(10))
+        loader = DataLoader(dataset, batch_size=3)
+
+        prefetch_loader = PrefetchLoader(loader, 2, torch.device("cpu"))
+
+        assert len(prefetch_loader) == len(loader)
+        for (data, target), (expected_data, expected_target) in zip(
+            prefetch_loader, loader
+        ):
+            assert torch.equal(data, expected_data)
+            assert torch.equal(target, expected_target)
+        # Stopping early must not leave the producer thread blocked on the queue.
+        assert len(next(iter(prefetch_loader))) == 2
+
+    @staticmethod
+    def test_error() -> None:
+        class FailingLoader:
+            sampler = None
+
+            def __iter__(self) -> Iterator[torch.Tensor]:
+                yield torch.zeros(1)
+                raise ValueError("bad batch")
+
+        prefetch_loader = PrefetchLoader(FailingLoader(), 1, torch.device("cpu"))
+
+        with pytest.raises(ValueError, match="bad batch"):
+            list(prefetch_loader)
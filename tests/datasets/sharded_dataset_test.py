@@ -0,0 +1,36 @@
+""" sharded_dataset_test.py """
+from pathlib import Path
+from typing import Dict, Tuple
+
+import torch
+from torch.utils.data import Dataset
+
+from ai_toolkit.datasets.sharded_dataset import ShardedDataset, write_shards
+
+Sample = Tuple[torch.Tensor, Dict[str, torch.Tensor]]
+
+
+class VariableLengthDataset(Dataset[Sample]):
+    def __len__(self) -> int:
+        return 5
+
+    def __getitem__(self, index: int) -> Sample:
+        return torch.arange(index * 2.0).reshape(index, 2), {
+            "label": torch.tensor(index)
+        }
+
+
+class TestShardedDataset:
+    @staticmethod
+    def test_variable_length_fields(tmp_path: Path) -> None:
+        dataset = VariableLengthDataset()
+
+        write_shards(dataset, tmp_path, shard_size=2)
+        packed = ShardedDataset(tmp_path)
+
+        assert len(packed) == len(dataset)
+        for i in range(len(dataset)):
+            data, target = packed[i]
+            expected_data, expected_target = dataset[i]
+            assert torch.equal(data, expected_data)
+            assert torch.equal(target["label"], expected_target["label"])
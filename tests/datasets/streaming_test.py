@@ -0,0 +1,69 @@
+""" streaming_test.py """
+import random
+from pathlib import Path
+from typing import List, Tuple
+
+from torch.utils.data import DataLoader
+
+from ai_toolkit.datasets.streaming import StreamingTextDataset
+
+
+class LineDataset(StreamingTextDataset):
+    def encode(self, line: str, label: int) -> Tuple[str, int]:
+        return line, label
+
+
+def write_files(tmp_path: Path) -> List[Path]:
+    filenames = []
+    for i in range(3):
+        filename = tmp_path / f"{i}.txt"
+        filename.write_text("".join(f"{i}-{j}\n" for j in range(50)))
+        filenames.append(filename)
+    return filenames
+
+
+class TestStreamingTextDataset:
+    @staticmethod
+    def test_split(tmp_path: Path) -> None:
+        dataset = LineDataset(write_files(tmp_path))
+
+        train = list(dataset.split(True, 0.2, shuffle_buffer=10))
+        val = list(dataset.split(False, 0.2))
+
+        assert not set(train) & set(val)
+        assert sorted(train + val) == sorted(dataset)
+        assert 0 < len(val) < len(train)
+        assert train == list(dataset.split(True, 0.2, shuffle_buffer=10))
+        assert train != sorted(train)
+
+    @staticmethod
+    def test_workers(tmp_path: Path) -> None:
+        dataset = LineDataset(write_files(tmp_path))
+
+        loader = DataLoader(dataset, batch_size=None, num_workers=2)
+
+        assert sorted(map(tuple, loader)) == sorted(dataset)
+        assert len(list(dataset)) == 150
+
+    @staticmethod
+    def test_byte_ranges(tmp_path: Path) -> None:
+        filename = tmp_path / "0.txt"
+        filename.write_text("".join(f"line-{j}\n" for j in range(100)))
+        dataset = LineDataset([filename])
+
+        parts = [list(dataset.read_lines(random.Random(), i, 3)) for i in range(3)]
+
+        assert all(parts)
+        assert sorted(sum(parts, [])) == sorted(dataset)
+        assert len(sum(parts, [])) == 100
+
+    @staticmethod
+    def test_open_file_window(tmp_path: Path) -> None:
+        dataset = LineDataset(write_files(tmp_path))
+        dataset.MAX_OPEN_FILES = 1
+
+        lines = list(dataset)
+
+        assert len(lines) == 150
+        # With one open file at a time, files are read one after another.
+        assert [label for _, label in lines] == sorted(label for _, label in lines)
@@ -0,0 +1,48 @@
+""" tensor_loader_test.py """
+import pytest
+import torch
+from torch.utils.data import TensorDataset
+
+from ai_toolkit import distributed
+from ai_toolkit.datasets import TensorBatchLoader
+from ai_toolkit.datasets.tensor_loader import materialize
+
+
+class TestTensorBatchLoader:
+    @staticmethod
+    def test_batches() -> None:
+        dataset = TensorDataset(torch.arange(10.0).unsqueeze(1), torch.arange(10))
+        tensors = materialize(dataset)
+
+        loader = TensorBatchLoader(tensors, [1, 3, 5, 7, 9], 2, tuple, shuffle=True)
+        batches = list(loader)
+
+        assert len(loader) == len(batches) == 3
+        targets = torch.cat([target for _, target in batches])
+        assert sorted(targets.tolist()) == [1, 3, 5, 7, 9]
+        assert all(
+            torch.equal(data.squeeze(1), target.float()) for data, target in batches
+        )
+
+    @staticmethod
+    def test_global_shuffle_per_rank(monkeypatch: pytest.MonkeyPatch) -> None:
+        tensors = materialize(TensorDataset(torch.arange(101)))
+        monkeypatch.setattr(distributed, "get_world_size", lambda: 2)
+        epochs = []
+        for epoch in range(2):
+            shards = []
+            for rank in range(2):
+                monkeypatch.setattr(distributed, "get_rank", lambda rank=rank: rank)
+                loader = TensorBatchLoader(tensors, range(101), 10, tuple, True)
+                loader.set_epoch(epoch)
+                shard = torch.cat([batch for (batch,) in loader]).tolist()
+                assert len(loader) == 5
+                shards.append(shard)
+            epochs.append(shards)
+
+        for shards in epochs:
+            # Equal steps on every rank, and no example is seen twice.
+            assert len(shards[0]) == len(shards[1]) == 50
+            assert not set(shards[0]) & set(shards[1])
+        # Ranks do not keep the same subset across epochs.
+        assert set(epochs[0][0]) != set(epochs[1][0])
@@ -0,0 +1,38 @@
+""" distributed_test.py """
+import os
+
+import pytest
+import torch
+import torch.distributed as dist
+
+from ai_toolkit import distributed
+
+
+def get_world_size() -> int:
+    return distributed.get_world_size()
+
+
+def fail_on_main_process() -> None:
+    if distributed.is_main_process():
+        raise RuntimeError("Simulated crash")
+    # The other worker waits for rank 0, which never arrives.
+    dist.barrier()
+
+
+class TestLaunch:
+    @staticmethod
+    def test_restores_caller_state() -> None:
+        num_threads = torch.get_num_threads()
+        master_port = os.environ.get("MASTER_PORT")
+
+        world_size = distributed.launch(get_world_size, (), 2)
+
+        assert world_size == 2
+        assert not distributed.is_initialized()
+        assert torch.get_num_threads() == num_threads
+        assert os.environ.get("MASTER_PORT") == master_port
+
+    @staticmethod
+    def test_main_process_failure() -> None:
+        with pytest.raises(RuntimeError, match="Simulated crash"):
+            distributed.launch(fail_on_main_process, (), 2)
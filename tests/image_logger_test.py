@@ -0,0 +1,98 @@
+""" image_logger_test.py """
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Tuple
+
+import pytest
+import torch
+from torch.utils.tensorboard import SummaryWriter
+
+from ai_toolkit.args import init_pipeline
+from ai_toolkit.image_logger import ImageReservoir
+from ai_toolkit.metric_tracker import MetricTracker, Mode
+
+
+class TestImageReservoir:
+    @staticmethod
+    def test_quota_per_class() -> None:
+        reservoir = ImageReservoir(quota=3)
+        target = torch.tensor([0, 1] * 50)
+        data = torch.arange(100).float().reshape(100, 1, 1, 1)
+
+        for rows in torch.arange(100).split(16):
+            reservoir.add(data[rows], target[rows], target[rows])
+
+        samples = reservoir.get_samples()
+        assert [c for _, c, _ in samples] == [0, 0, 0, 1, 1, 1]
+        assert all(int(image) % 2 == c for image, c, _ in samples)
+        assert len({int(image) for image, _, _ in samples}) == 6
+
+    @staticmethod
+    def test_uniform() -> None:
+        counts = torch.zeros(20)
+        for seed in range(500):
+            reservoir = ImageReservoir(quota=2, seed=seed)
+            for start in range(0, 20, 5):
+                rows = torch.arange(start, start + 5)
+                reservoir.add(
+                    rows.reshape(5, 1), rows, torch.zeros(5, dtype=torch.long)
+                )
+            for image, _, _ in reservoir.get_samples():
+                counts[int(image)] += 1
+
+        # Each example is kept with probability 2 / 20.
+        assert counts.min() > 25
+        assert counts.max() < 75
+
+    @staticmethod
+    def test_limit() -> None:
+        reservoir = ImageReservoir(quota=1)
+        target = torch.arange(10)
+
+        reservoir.add(target.reshape(10, 1), target, target)
+        samples = reservoir.get_samples(limit=5)
+
+        assert len(samples) == 5
+        classes = [c for _, c, _ in samples]
+        assert classes == sorted(set(classes))
+
+    @staticmethod
+    def test_disabled() -> None:
+        reservoir = ImageReservoir(quota=0)
+
+        reservoir.add(torch.zeros(4, 1), torch.zeros(4), torch.zeros(4))
+
+        assert not reservoir.get_samples()
+
+
+class TestImageLogging:
+    @staticmethod
+    def test_epoch_budget(
+        example_batch: SimpleNamespace, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        args, _, _ = init_pipeline(
+            "--epochs=1", "--image-budget=10", f"--save-dir={tmp_path}"
+        )
+        calls: List[Tuple[str, int]] = []
+        monkeypatch.setattr(
+            SummaryWriter,
+            "add_image",
+            lambda self, tag, image, step: calls.append((tag, step)),
+        )
+        metrics = MetricTracker(args, {}, [str(i) for i in range(5)])
+        metrics.reset_hard()
+
+        for i in range(10):
+            _ = metrics.batch_update(example_batch, i, 10, Mode.VAL)
+        metrics.epoch_update(Mode.VAL)
+        metrics.flush()
+
+        assert metrics.image_writer is not None
+        assert not metrics.image_writer.thread.is_alive()
+        # A quota of 2 for each of the 3 classes in the batch.
+        assert (
+            sorted(calls)
+            == [("0/Predicted_0", 0)] * 2
+            + [("1/Predicted_1", 0)] * 2
+            + [("3/Predicted_4", 0)] * 2
+        )
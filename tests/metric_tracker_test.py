@@ -2,6 +2,7 @@
 from types import SimpleNamespace
 
 import pytest
+import torch
 
 from ai_toolkit.args import init_pipeline
 from ai_toolkit.metric_tracker import MetricTracker, Mode
@@ -27,7 +28,9 @@ class TestMetricTracker:
 
         for key in tqdm_dict:
             tqdm_dict[key] = round(tqdm_dict[key], 2)
-        result = [round(metric.epoch_avg, 2) for metric in metrics.metric_data.values()]
+        result = [
+            round(float(metric.epoch_avg), 2) for metric in metrics.metric_data.values()
+        ]
         assert tqdm_dict == {"Loss": 0.21, "Accuracy": 0.67}
         assert result == [0.63, 2]
 
@@ -44,7 +47,9 @@ class TestMetricTracker:
 
         for key in tqdm_dict:
             tqdm_dict[key] = round(tqdm_dict[key], 2)
-        result = [round(metric.epoch_avg, 2) for metric in metrics.metric_data.values()]
+        result = [
+            round(float(metric.epoch_avg), 2) for metric in metrics.metric_data.values()
+        ]
         assert tqdm_dict == {"Loss": 0.21, "Accuracy": 0.67}
         assert all(metric.running_avg == 0 for metric in metrics.metric_data.values())
         assert result == [2.52, 8]
@@ -66,6 +71,21 @@ class TestMetricTracker:
         captured = capsys.readouterr().out
         assert captured == "Mode.TRAIN Loss: 0.2100 Accuracy: 66.67% \n"
 
+    @staticmethod
+    def test_nan_loss_deferred(example_batch: SimpleNamespace) -> None:
+        args, _, _ = init_pipeline(
+            "--no-save", "--no-visualize", "--epochs=1", "--log-interval=3"
+        )
+        metrics = MetricTracker(args, {})
+        num_batches = 4
+        example_batch.loss = torch.tensor([float("nan")])
+
+        tqdm_dict = metrics.batch_update(example_batch, 1, num_batches, Mode.TRAIN)
+
+        assert not tqdm_dict
+        with pytest.raises(RuntimeError, match="NaN or inf"):
+            metrics.batch_update(example_batch, 3, num_batches, Mode.TRAIN)
+
     @staticmethod
     def test_checkpoint_continue() -> None:
         pass
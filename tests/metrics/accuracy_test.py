@@ -5,14 +5,6 @@ from ai_toolkit.metrics import Accuracy
 
 
 class TestAccuracy:
-    @staticmethod
-    def test_calculate_accuracy(example_batch: SimpleNamespace) -> None:
-        output, target = example_batch.output, example_batch.target
-
-        accuracy = Accuracy.calculate_accuracy(output, target)
-
-        assert accuracy == 2
-
     @staticmethod
     def test_batch_accuracy(example_batch: SimpleNamespace) -> None:
         metric = Accuracy()
@@ -28,3 +20,12 @@ class TestAccuracy:
         _ = metric.update(example_batch)
 
         assert str(metric) == "Accuracy: 66.67%"
+
+    @staticmethod
+    def test_count_beyond_float32(example_batch: SimpleNamespace) -> None:
+        metric = Accuracy()
+        metric.epoch_avg = 2**24
+
+        _ = metric.update(example_batch)
+
+        assert metric.epoch_avg == 2**24 + 2
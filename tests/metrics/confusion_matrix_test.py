@@ -0,0 +1,45 @@
+""" confusion_matrix_test.py """
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import torch
+from torch.utils.tensorboard import SummaryWriter
+
+from ai_toolkit.metrics import ConfusionMatrix
+
+
+class TestConfusionMatrix:
+    @staticmethod
+    def test_update(example_batch: SimpleNamespace) -> None:
+        metric = ConfusionMatrix()
+
+        for _ in range(2):
+            _ = metric.update(example_batch)
+
+        expected = torch.zeros(5, 5, dtype=torch.int64)
+        expected[0, 0] = expected[1, 1] = expected[3, 4] = 2
+        assert torch.equal(metric.get_matrix(), expected)
+        assert metric.value == pytest.approx(2 / 3)
+
+    @staticmethod
+    def test_per_class_scores(example_batch: SimpleNamespace) -> None:
+        metric = ConfusionMatrix()
+
+        _ = metric.update(example_batch)
+
+        assert metric.precision().tolist() == [1, 1, 0, 0, 0]
+        assert metric.recall().tolist() == [1, 1, 0, 0, 0]
+        assert metric.f1_score().tolist() == [1, 1, 0, 0, 0]
+
+    @staticmethod
+    def test_write_figures(example_batch: SimpleNamespace, tmp_path: Path) -> None:
+        metric = ConfusionMatrix()
+        _ = metric.update(example_batch)
+
+        with SummaryWriter(str(tmp_path)) as writer:
+            metric.write_figures(
+                writer, "Val_Epoch_ConfusionMatrix", 1, str(tmp_path), []
+            )
+
+        assert (tmp_path / "Val_Epoch_ConfusionMatrix.png").is_file()
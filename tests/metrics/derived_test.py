@@ -0,0 +1,43 @@
+""" derived_test.py """
+from types import SimpleNamespace
+from typing import List, cast
+
+import pytest
+import torch
+
+from ai_toolkit.metrics import Accuracy, DerivedValues, Loss
+from ai_toolkit.metrics.derived import DERIVED_VALUES
+
+
+class TestDerivedValues:
+    @staticmethod
+    def test_computed_once(
+        example_batch: SimpleNamespace, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        calls: List[str] = []
+
+        def argmax(val_dict: SimpleNamespace) -> torch.Tensor:
+            calls.append("argmax")
+            return cast(torch.Tensor, val_dict.output.argmax(1))
+
+        monkeypatch.setitem(DERIVED_VALUES, "argmax", argmax)
+        example_batch.derived = DerivedValues(example_batch)
+
+        for metric in (Accuracy(), Accuracy(), Loss()):
+            _ = metric.update(example_batch)
+
+        assert calls == ["argmax"]
+
+    @staticmethod
+    def test_one_hot(example_batch: SimpleNamespace) -> None:
+        derived = DerivedValues(example_batch)
+
+        one_hot = derived["one_hot"]
+
+        assert one_hot.shape == example_batch.output.shape
+        assert one_hot.argmax(1).tolist() == example_batch.target.tolist()
+
+    @staticmethod
+    def test_undeclared(example_batch: SimpleNamespace) -> None:
+        with pytest.raises(RuntimeError):
+            _ = Loss().derived(example_batch, "argmax")
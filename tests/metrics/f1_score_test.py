@@ -0,0 +1,49 @@
+""" f1_score_test.py """
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+from ai_toolkit.metrics import F1Score
+
+
+class TestF1Score:
+    @staticmethod
+    @pytest.mark.parametrize(
+        "average, expected", [("micro", 2 / 3), ("macro", 1 / 2), ("weighted", 2 / 3)]
+    )
+    def test_average(
+        example_batch: SimpleNamespace, average: str, expected: float
+    ) -> None:
+        metric = F1Score(average=average)
+
+        _ = metric.update(example_batch)
+
+        assert metric.value == pytest.approx(expected)
+
+    @staticmethod
+    def test_epoch_counts() -> None:
+        metric = F1Score()
+        output = torch.eye(3)[[0, 0, 1, 2, 2, 2]]
+        target = torch.tensor([0, 1, 1, 2, 2, 0])
+
+        for i in (0, 3):
+            batch = {"output": output[i : i + 3], "target": target[i : i + 3]}
+            _ = metric.update(SimpleNamespace(**batch, batch_size=3))
+
+        # Per class: (tp, fp, fn) = (1, 1, 1), (1, 0, 1), (2, 1, 0)
+        assert metric.counts is not None
+        assert metric.counts.tolist() == [[1, 1, 2], [1, 0, 1], [1, 1, 0]]
+        assert metric.value == pytest.approx((1 / 2 + 2 / 3 + 4 / 5) / 3)
+        metric.average = "weighted"
+        assert metric.value == pytest.approx((2 * 1 / 2 + 2 * 2 / 3 + 2 * 4 / 5) / 6)
+        metric.average = "micro"
+        assert metric.value == pytest.approx(4 / 6)
+
+    @staticmethod
+    def test_repr(example_batch: SimpleNamespace) -> None:
+        metric = F1Score()
+
+        _ = metric.update(example_batch)
+
+        assert str(metric) == "F1Score: 0.5000"
@@ -0,0 +1,98 @@
+""" score_histogram_test.py """
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, List, Type
+
+import pytest
+import torch
+from torch.nn import functional as F
+from torch.utils.tensorboard import SummaryWriter
+
+from ai_toolkit.metrics import AUROC, AveragePrecision, ScoreHistogram
+
+
+def random_batches(num_classes: int = 4) -> List[SimpleNamespace]:
+    torch.manual_seed(0)
+    batches = []
+    for _ in range(3):
+        target = torch.randint(num_classes, (50,))
+        output = torch.randn(50, num_classes) + 2 * F.one_hot(target, num_classes)
+        batches.append(SimpleNamespace(output=output, target=target, batch_size=50))
+    return batches
+
+
+def exact_auroc(scores: torch.Tensor, labels: torch.Tensor) -> float:
+    positives, negatives = scores[labels], scores[~labels]
+    pairs = positives[:, None] - negatives[None, :]
+    return float(((pairs > 0).double() + (pairs == 0).double() / 2).mean())
+
+
+def exact_average_precision(scores: torch.Tensor, labels: torch.Tensor) -> float:
+    order = scores.argsort(descending=True)
+    hits = labels[order].double()
+    precision = hits.cumsum(0) / torch.arange(1, len(hits) + 1)
+    return float((precision * hits).sum() / hits.sum())
+
+
+class TestScoreHistogram:
+    @staticmethod
+    @pytest.mark.parametrize(
+        "metric_class, exact_fn",
+        [(AUROC, exact_auroc), (AveragePrecision, exact_average_precision)],
+    )
+    def test_matches_exact(
+        metric_class: Type[ScoreHistogram],
+        exact_fn: Callable[[torch.Tensor, torch.Tensor], float],
+    ) -> None:
+        batches = random_batches()
+        metric = metric_class(num_bins=100000)
+
+        for batch in batches:
+            _ = metric.update(batch)
+
+        scores = torch.cat([F.softmax(batch.output, dim=1) for batch in batches])
+        target = torch.cat([batch.target for batch in batches])
+        expected = [exact_fn(scores[:, c], target == c) for c in range(4)]
+        assert metric.value == pytest.approx(sum(expected) / 4, abs=1e-4)
+
+    @staticmethod
+    def test_memory_bounded() -> None:
+        metric = AUROC(num_bins=10)
+
+        for batch in random_batches():
+            _ = metric.update(batch)
+
+        assert metric.histograms is not None
+        assert metric.histograms.shape == (2, 4, 10)
+        assert metric.histograms.sum() == 3 * 50 * 4
+
+    @staticmethod
+    def test_undefined_classes() -> None:
+        metric = AUROC()
+        batch = SimpleNamespace(
+            output=torch.tensor([[2.0, 0, 0], [0, 2.0, 0]]),
+            target=torch.tensor([0, 1]),
+            batch_size=2,
+        )
+
+        _ = metric.update(batch)
+
+        assert metric.histograms is not None
+        _, defined = metric.calculate_per_class(metric.histograms)
+        assert defined.tolist() == [True, True, False]
+        assert metric.value == 1
+
+    @staticmethod
+    def test_write_figures(tmp_path: Path) -> None:
+        auroc, average_precision = AUROC(num_bins=20), AveragePrecision(num_bins=20)
+        for batch in random_batches():
+            _ = auroc.update(batch)
+            _ = average_precision.update(batch)
+
+        with SummaryWriter(str(tmp_path)) as writer:
+            auroc.write_figures(writer, "Val_Epoch_AUROC", 1, str(tmp_path), [])
+            average_precision.write_figures(
+                writer, "Val_Epoch_AveragePrecision", 1, str(tmp_path), []
+            )
+
+        assert (tmp_path / "Val_Epoch_AUROC.png").is_file()
@@ -0,0 +1,81 @@
+""" metrics_log_test.py """
+from pathlib import Path
+
+import numpy as np
+
+from ai_toolkit.metric_tracker import Mode
+from ai_toolkit.metrics_log import (
+    RECORD_DTYPE,
+    RECORDS_FILE,
+    MetricsLogWriter,
+    load_runs,
+    load_series,
+)
+from ai_toolkit.train import train
+
+
+class TestMetricsLog:
+    @staticmethod
+    def test_write_and_load(tmp_path: Path) -> None:
+        writer = MetricsLogWriter(tmp_path)
+        for step in range(3):
+            writer.add_scalar("Train_Batch_Loss", 1 / (step + 1), step)
+            writer.add_scalar("Train_Batch_Accuracy", step / 3, step)
+
+        assert load_series(tmp_path, "Train_Batch_Loss")[0].size == 0
+        writer.flush()
+        writer = MetricsLogWriter(tmp_path)
+        writer.add_scalar("Train_Batch_Loss", 0.125, 3)
+        writer.flush()
+
+        steps, values = load_series(tmp_path, "Train_Batch_Loss")
+        np.testing.assert_array_equal(steps, [0, 1, 2, 3])
+        np.testing.assert_allclose(values, [1, 1 / 2, 1 / 3, 1 / 8])
+
+    @staticmethod
+    def test_partial_record(tmp_path: Path) -> None:
+        writer = MetricsLogWriter(tmp_path)
+        writer.add_scalar("Val_Epoch_Loss", 0.5, 1)
+        writer.flush()
+        with open(tmp_path / RECORDS_FILE, "ab") as f:
+            f.write(b"\0" * (RECORD_DTYPE.itemsize - 1))
+
+        steps, values = load_series(tmp_path, "Val_Epoch_Loss")
+
+        assert steps.tolist() == [1]
+        assert values.tolist() == [0.5]
+
+    @staticmethod
+    def test_resume_after_partial_record(tmp_path: Path) -> None:
+        writer = MetricsLogWriter(tmp_path)
+        writer.add_scalar("Val_Epoch_Loss", 0.5, 1)
+        writer.flush()
+        with open(tmp_path / RECORDS_FILE, "ab") as f:
+            f.write(b"\1" * 7)
+
+        writer = MetricsLogWriter(tmp_path)
+        writer.add_scalar("Val_Epoch_Loss", 0.25, 2)
+        writer.flush()
+
+        steps, values = load_series(tmp_path, "Val_Epoch_Loss")
+        assert steps.tolist() == [1, 2]
+        assert values.tolist() == [0.5, 0.25]
+
+    @staticmethod
+    def test_train_columnar(tmp_path: Path) -> None:
+        config = ["--no-visualize", "--num-examples=100", "--scalar-logs", "columnar"]
+
+        for checkpoint in ("A", "B"):
+            _ = train(
+                "--epochs=2",
+                *config,
+                f"--checkpoint={checkpoint}",
+                f"--save-dir={tmp_path}",
+            )
+
+        runs = load_runs(sorted(tmp_path.iterdir()), f"{Mode.VAL}_Epoch_Loss")
+        assert len(runs) == 2
+        for steps, values in runs.values():
+            assert steps.tolist() == [1, 2]
+            assert np.isfinite(values).all()
+        assert not list(tmp_path.glob("*/events.out.tfevents*"))
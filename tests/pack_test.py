@@ -0,0 +1,41 @@
+""" pack_test.py """
+from pathlib import Path
+
+import torch
+
+from ai_toolkit import pack
+from ai_toolkit.args import set_random_seeds
+from ai_toolkit.datasets import DatasetRNN
+from ai_toolkit.datasets.sharded_dataset import ShardedDataset
+from ai_toolkit.train import train
+
+
+class TestPack:
+    @staticmethod
+    def test_pack(tmp_path: Path) -> None:
+        pack(f"--shard-dir={tmp_path}")
+
+        set_random_seeds()
+        dataset = DatasetRNN().load_dataset()
+        packed = ShardedDataset(tmp_path / "train")
+
+        assert len(packed) == len(dataset)
+        assert packed.model_params == dataset.model_params
+        assert packed.lengths is not None
+        assert torch.equal(packed.lengths, dataset.lengths)
+        for i in (0, len(dataset) - 1):
+            assert all(torch.equal(a, b) for a, b in zip(packed[i], dataset[i]))
+
+    @staticmethod
+    def test_train_from_shards(tmp_path: Path) -> None:
+        pack(f"--shard-dir={tmp_path / 'shards'}")
+
+        metric_tracker = train(
+            "--no-visualize",
+            "--num-examples=100",
+            "--epoch=1",
+            f"--shard-dir={tmp_path / 'shards'}",
+            f"--save-dir={tmp_path}",
+        )
+
+        assert metric_tracker["Loss"].num_examples == 100
@@ -0,0 +1,33 @@
+""" predictions_test.py """
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+from ai_toolkit.predictions import NpyWriter
+
+
+class TestNpyWriter:
+    @staticmethod
+    def test_append_rows(tmp_path: Path) -> None:
+        path = tmp_path / "rows.npy"
+        batches = [torch.randn(n, 3, 2) for n in (4, 1, 5)]
+        writer = NpyWriter(path)
+        for batch in batches:
+            writer.write(batch)
+        writer.close()
+
+        result = np.load(path, mmap_mode="r")
+
+        assert result.shape == (10, 3, 2)
+        np.testing.assert_array_equal(result, torch.cat(batches).numpy())
+
+    @staticmethod
+    def test_mismatched_rows(tmp_path: Path) -> None:
+        writer = NpyWriter(tmp_path / "rows.npy")
+        writer.write(torch.zeros(2, 3, dtype=torch.int64))
+
+        with pytest.raises(RuntimeError):
+            writer.write(torch.zeros(2, 4, dtype=torch.int64))
+        writer.close()
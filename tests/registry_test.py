@@ -0,0 +1,99 @@
+""" registry_test.py """
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+import torch.nn as nn
+
+from ai_toolkit import registry
+from ai_toolkit.losses import get_loss_initializer
+from ai_toolkit.models import get_model_initializer
+
+HEAVY_MODULES = ("matplotlib", "PIL", "tensorboard", "torchvision", "wget")
+
+IMPORT_CHECK = f"""
+import sys
+
+from ai_toolkit.test import test
+from ai_toolkit.train import train
+from ai_toolkit.datasets import get_dataset_initializer
+from ai_toolkit.losses import get_loss_initializer
+from ai_toolkit.metrics import get_metric_initializer
+from ai_toolkit.models import get_model_initializer
+
+get_model_initializer("BasicRNN")
+get_dataset_initializer("DatasetRNN")
+get_loss_initializer("nn.CrossEntropyLoss")
+get_metric_initializer("Loss")
+get_metric_initializer("Accuracy")
+print(",".join(m for m in {HEAVY_MODULES} if m in sys.modules))
+print(",".join(sorted(m for m in sys.modules if m.startswith("ai_toolkit.models."))))
+"""
+
+IMPORT_TIME_CHECK = """
+import torch
+import ai_toolkit.models
+"""
+
+
+class TestRegistry:
+    @staticmethod
+    def test_import_time() -> None:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", IMPORT_TIME_CHECK],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        # Lines read "import time: <self us> | <cumulative us> | <module>".
+        cumulative_us = {}
+        for line in result.stderr.splitlines():
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                cumulative_us[name.strip()] = int(cumulative)
+
+        # Time on top of importing torch, which is well under 0.1s. Importing the
+        # models eagerly would also import torchvision, which takes over a second.
+        assert cumulative_us["ai_toolkit"] < 1_000_000
+
+    @staticmethod
+    def test_lazy_imports() -> None:
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_CHECK],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        heavy_modules, model_modules = result.stdout.splitlines()
+
+        # A BasicRNN run only imports the model it uses.
+        assert heavy_modules == ""
+        assert model_modules == "ai_toolkit.models.rnn"
+
+    @staticmethod
+    def test_lazy_attribute() -> None:
+        from ai_toolkit.models import (  # pylint: disable=import-outside-toplevel
+            BasicRNN,
+        )
+
+        assert get_model_initializer("BasicRNN") is BasicRNN
+        with pytest.raises(RuntimeError):
+            _ = get_model_initializer("UNet")
+
+    @staticmethod
+    def test_plugin(monkeypatch: pytest.MonkeyPatch) -> None:
+        # Python 3.7 has no importlib.metadata, and so no plugins.
+        metadata = pytest.importorskip("importlib.metadata")
+        entry_point = metadata.EntryPoint(
+            "L1Loss", "torch.nn:L1Loss", "ai_toolkit.losses"
+        )
+        entry_points = SimpleNamespace(
+            select=lambda group: [entry_point] if group == "ai_toolkit.losses" else []
+        )
+        monkeypatch.setattr(registry.metadata, "entry_points", lambda: entry_points)
+        losses = registry.Registry("ai_toolkit.losses", "ai_toolkit.losses", {})
+
+        assert "L1Loss" in losses
+        assert losses.get("L1Loss") is nn.L1Loss
+        assert get_loss_initializer("nn.CrossEntropyLoss") is nn.CrossEntropyLoss
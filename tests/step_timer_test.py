@@ -0,0 +1,28 @@
+""" step_timer_test.py """
+from ai_toolkit.step_timer import StepTimer
+
+
+class TestStepTimer:
+    @staticmethod
+    def test_disabled() -> None:
+        timer = StepTimer()
+
+        timer.lap("data")
+        timer.end_step(3)
+
+        assert not timer.summary()
+        assert str(timer) == ""
+
+    @staticmethod
+    def test_summary() -> None:
+        timer = StepTimer(enabled=True)
+
+        for _ in range(4):
+            for phase in StepTimer.PHASES:
+                timer.lap(phase)
+            timer.end_step(3)
+        summary = timer.summary()
+
+        assert timer.num_samples == 12
+        assert summary["p50_step_ms"] <= summary["p95_step_ms"]
+        assert round(sum(summary[f"{phase}_frac"] for phase in timer.PHASES), 5) == 1
@@ -0,0 +1,50 @@
+""" test_test.py """
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ai_toolkit.test import test as run_test
+from ai_toolkit.train import train
+
+
+class TestTest:
+    @staticmethod
+    def test_distributed(tmp_path: Path) -> None:
+        config = ["--checkpoint=TEST", f"--save-dir={tmp_path}"]
+        metrics = [
+            "--metrics",
+            "Loss",
+            "Accuracy",
+            "ConfusionMatrix",
+            "F1Score",
+            "AUROC",
+        ]
+        _ = train(
+            "--no-visualize", "--num-examples=100", "--epoch=1", *metrics, *config
+        )
+
+        result = run_test(*config)
+        distributed_result = run_test("--nproc=2", *config)
+
+        assert distributed_result["Accuracy"] == result["Accuracy"]
+        assert distributed_result["ConfusionMatrix"] == result["Accuracy"]
+        assert distributed_result["F1Score"] == pytest.approx(result["F1Score"])
+        assert distributed_result["AUROC"] == pytest.approx(result["AUROC"])
+        assert distributed_result["Loss"] == pytest.approx(result["Loss"])
+
+    @staticmethod
+    def test_save_predictions(tmp_path: Path) -> None:
+        config = ["--checkpoint=TEST", f"--save-dir={tmp_path}"]
+        _ = train("--no-visualize", "--num-examples=100", "--epoch=1", *config)
+        args_mtime = (tmp_path / "TEST" / "args.json").stat().st_mtime_ns
+
+        result = run_test("--save-predictions", *config)
+
+        predictions = np.load(tmp_path / "TEST" / "predictions.npy", mmap_mode="r")
+        targets = np.load(tmp_path / "TEST" / "targets.npy", mmap_mode="r")
+        assert predictions.shape[0] == targets.shape[0]
+        accuracy = (predictions.argmax(1) == targets).mean()
+        assert accuracy == pytest.approx(result["Accuracy"])
+        # Evaluation leaves the run's args.json alone.
+        assert (tmp_path / "TEST" / "args.json").stat().st_mtime_ns == args_mtime
@@ -1,6 +1,12 @@
 """ train_test.py """
 from pathlib import Path
+from typing import Any, Dict
 
+import pytest
+import torch
+
+from ai_toolkit.args import init_pipeline
+from ai_toolkit.metric_tracker import MetricTracker, Mode
 from ai_toolkit.train import train
 
 
@@ -27,8 +33,126 @@ class TestTrain:
 
         assert metrics_test == metrics_end
 
+    @staticmethod
+    def test_step_resume(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        config = [
+            "--no-visualize",
+            "--num-examples=100",
+            "--batch-size=10",
+            "--checkpoint-every-steps=3",
+            f"--save-dir={tmp_path}",
+        ]
+        batch_update = MetricTracker.batch_update
+
+        def crash(self: MetricTracker, *args: Any) -> Dict[str, float]:
+            _, i, _, mode = args
+            if self.epoch == 2 and mode == Mode.TRAIN and i == 7:
+                raise RuntimeError("Simulated crash")
+            return batch_update(self, *args)
+
+        with monkeypatch.context() as m:
+            m.setattr(MetricTracker, "batch_update", crash)
+            with pytest.raises(RuntimeError, match="Simulated crash"):
+                _ = train("--epoch=2", "--checkpoint=TEST", *config)
+        # Resumes at step 6 of epoch 2, then trains another epoch.
+        metrics_end = train("--epoch=2", "--checkpoint=TEST", *config)
+
+        metrics_test = train("--epoch=3", *config)
+
+        assert metrics_end.epoch == metrics_test.epoch == 3
+        assert metrics_test == metrics_end
+
     @staticmethod
     def test_configs(tmp_path: Path) -> None:
         metric_tracker = train("--config=test", f"--save-dir={tmp_path}")
 
         assert Path(metric_tracker.run_name).name == "A"
+
+    @staticmethod
+    def test_precision_resume(tmp_path: Path) -> None:
+        config = ["--no-visualize", "--num-examples=100", f"--save-dir={tmp_path}"]
+        _ = train("--epoch=1", "--checkpoint=TEST", "--precision=bf16", *config)
+
+        args, _, _ = init_pipeline("--checkpoint=TEST", *config)
+
+        assert args.precision == "bf16"
+
+    @staticmethod
+    @pytest.mark.skipif(torch.cuda.is_available(), reason="fp16 is allowed on CUDA")
+    def test_fp16_requires_cuda() -> None:
+        with pytest.raises(RuntimeError, match="fp16 requires CUDA"):
+            _ = init_pipeline("--precision=fp16")
+
+    @staticmethod
+    def test_distributed(tmp_path: Path) -> None:
+        metric_tracker = train(
+            "--no-visualize",
+            "--num-examples=100",
+            "--epoch=1",
+            "--nproc=2",
+            f"--save-dir={tmp_path}",
+        )
+
+        assert metric_tracker["Loss"].num_examples == 100
+        assert (Path(metric_tracker.run_name) / "checkpoint.ckpt").is_file()
+
+    @staticmethod
+    def test_distributed_stream() -> None:
+        with pytest.raises(RuntimeError, match="--stream requires --nproc=1"):
+            _ = train("--stream", "--nproc=2", "--no-save")
+
+    @staticmethod
+    def test_profile(tmp_path: Path) -> None:
+        metric_tracker = train(
+            "--no-visualize",
+            "--num-examples=100",
+            "--epoch=1",
+            "--batch-size=10",
+            "--profile",
+            f"--save-dir={tmp_path}",
+        )
+
+        trace_dir = Path(metric_tracker.run_name) / "profiler"
+        assert list(trace_dir.glob("*.pt.trace.json"))
+
+    @staticmethod
+    def test_profile_no_save() -> None:
+        with pytest.raises(RuntimeError, match="--profile cannot be used"):
+            _ = train("--profile", "--no-save")
+
+    @staticmethod
+    def test_prefetch(tmp_path: Path) -> None:
+        config = ["--no-visualize", "--num-examples=100", f"--save-dir={tmp_path}"]
+        metrics_prefetch = train("--epoch=1", "--prefetch=2", *config)
+
+        metrics = train("--epoch=1", *config)
+
+        assert metrics_prefetch["Loss"].value == metrics["Loss"].value
+
+    @staticmethod
+    def test_stream(tmp_path: Path) -> None:
+        metric_tracker = train(
+            "--no-visualize",
+            "--num-examples=100",
+            "--epoch=2",
+            "--stream",
+            "--batch-size=16",
+            f"--save-dir={tmp_path}",
+        )
+
+        assert metric_tracker["Loss"].num_examples == 100
+
+    @staticmethod
+    def test_lazy_shuffle_resume(tmp_path: Path) -> None:
+        config = [
+            "--no-visualize",
+            "--num-examples=100",
+            "--lazy-shuffle",
+            f"--save-dir={tmp_path}",
+        ]
+        _ = train("--epoch=1", "--checkpoint=TEST", *config)
+        metrics_end = train("--epoch=1", "--checkpoint=TEST", *config)
+
+        metrics_test = train("--epoch=2", *config)
+
+        assert metrics_test == metrics_end
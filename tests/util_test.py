@@ -0,0 +1,93 @@
+""" util_test.py """
+import random
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import torch
+
+from ai_toolkit import util
+from ai_toolkit.metrics import Accuracy
+
+
+class TestCheckpointWriter:
+    @staticmethod
+    def test_save_and_flush(tmp_path: Path) -> None:
+        writer = util.CheckpointWriter()
+        weights = torch.ones(3)
+        state = {"model_state_dict": {"weight": weights}, "run_name": str(tmp_path)}
+
+        writer.save(state, is_best=True)
+        weights += 1
+        writer.save(state, is_best=False)
+        writer.close()
+
+        last = util.load_checkpoint(tmp_path)
+        best = util.load_checkpoint(tmp_path, use_best=True)
+        assert torch.equal(last["model_state_dict"]["weight"], torch.full((3,), 2.0))
+        assert torch.equal(best["model_state_dict"]["weight"], torch.ones(3))
+        assert not list(tmp_path.glob("*.tmp"))
+        assert not writer.thread.is_alive()
+        writer.close()
+
+
+class TestLoadCheckpoint:
+    @staticmethod
+    def test_lazy_sections(tmp_path: Path) -> None:
+        state: Dict[str, Any] = {
+            "model_state_dict": {"weight": torch.arange(6.0).reshape(2, 3)},
+            "rng_state": (3, [1, 2]),
+            "run_name": str(tmp_path),
+        }
+        util.write_checkpoint(state, is_best=False)
+
+        checkpoint = util.load_checkpoint(tmp_path)
+
+        assert set(checkpoint) == set(state)
+        assert torch.equal(
+            checkpoint["model_state_dict"]["weight"],
+            state["model_state_dict"]["weight"],
+        )
+        assert "rng_state" not in checkpoint.cache  # type: ignore[attr-defined]
+        assert checkpoint["rng_state"] == (3, [1, 2])
+
+    @staticmethod
+    def test_dtypes(tmp_path: Path) -> None:
+        tensors = [
+            torch.arange(6, dtype=torch.bfloat16).reshape(2, 3),
+            torch.tensor([1 + 2j, -3.5j], dtype=torch.complex64),
+            torch.tensor([[1 + 2j], [-3.5j]], dtype=torch.complex128),
+            torch.tensor(2 - 1j, dtype=torch.complex128),
+            torch.tensor([True, False]),
+        ]
+        state = {"tensors": tensors, "run_name": str(tmp_path)}
+        util.write_checkpoint(state, is_best=False)
+
+        checkpoint = util.load_checkpoint(tmp_path)
+
+        for loaded, tensor in zip(checkpoint["tensors"], tensors):
+            assert loaded.dtype == tensor.dtype
+            assert torch.equal(loaded, tensor)
+
+    @staticmethod
+    def test_legacy_checkpoint(tmp_path: Path) -> None:
+        state = {
+            "model_state_dict": {"weight": torch.ones(2)},
+            "rng_state": random.getstate(),
+            "np_rng_state": np.random.get_state(),
+            "torch_rng_state": torch.get_rng_state(),
+            "run_name": str(tmp_path),
+            "metric_obj": {
+                "epoch": 1,
+                "metric_data": {"Accuracy": Accuracy()},
+                "primary_metric": "Accuracy",
+                "is_best": True,
+            },
+        }
+        torch.save(state, tmp_path / "checkpoint.pth.tar")
+
+        checkpoint = util.load_checkpoint(tmp_path)
+        util.set_rng_state(checkpoint)
+
+        assert torch.equal(checkpoint["model_state_dict"]["weight"], torch.ones(2))
+        assert isinstance(checkpoint["metric_obj"]["metric_data"]["Accuracy"], Accuracy)